@@ -1,2 +1,2 @@
 redis-server
-sudo -u www-data bash -c "venv/bin/celery worker -A yadage.backends.celeryapp -I yadage.backends.packtivity_celery -l debug"
+sudo -u www-data bash -c "venv/bin/celery worker -A yadage.backends.celeryapp -I yadage.backends.packtivity_celery -O fair --prefetch-multiplier=1 -l debug"
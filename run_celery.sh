@@ -1,4 +1,4 @@
 #!/bin/sh
 
 #su -m celery_user -c "celery worker -A packtivity.asyncbackends:default_celeryapp -I packtivity.asyncbackends -l debug"
-celery worker -A packtivity.asyncbackends:default_celeryapp -I packtivity.asyncbackends -l debug
+celery worker -A packtivity.asyncbackends:default_celeryapp -I packtivity.asyncbackends -O fair --prefetch-multiplier=1 -l debug
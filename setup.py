@@ -19,6 +19,7 @@ setup(
         'pymongo',
         'celery',
         'redis',
+        'scandir; python_version < "3.5"',
         'yadage>=0.10.8'
     ]
 )
@@ -4,32 +4,45 @@ import yaml
 import sys
 import time
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 from pymongo import MongoClient
-from yadageengine.engine import YADAGEEngine
-from yadageengine.workflow import WORKFLOW_ERROR, WORKFLOW_SUCCESS, WORKFLOW_RUNNING
+from yadageengine.engine import YADAGEEngine, remove_directory
+from yadageengine.workflow import WORKFLOW_ERROR, WORKFLOW_RUNNING, WORKFLOW_SUCCESS
 
 
 """Assumes that the template server is running at the follwoing Url."""
 CONFIG_FILE = './data/config.yaml'
 
+"""Number of seconds to wait before polling the state of a running workflow.
+Task completion is not written to the database by the Celery workers. The
+engine only synchronizes the workflow state with the backend when the
+workflow is read, i.e., there is no change event to wait for."""
+POLL_INTERVAL = 1
+
+"""The workflow run stops once the workflow is in one of these states."""
+TERMINAL_STATES = frozenset((WORKFLOW_ERROR, WORKFLOW_SUCCESS))
+
 """Create a Yadage engine with an empty repository.
 """
 # Read configuration
 with open(CONFIG_FILE, 'r') as f:
-    obj = yaml.load(f.read())
+    obj = yaml.load(f, Loader=SafeLoader)
 config = {kvp['key'] : kvp['value'] for kvp in obj['properties']}
 # Drop database
 MongoClient().drop_database(config['mongo.db'])
 # Drop workflow directory
 workflow_dir = config['db.workdir']
-if os.path.isdir(workflow_dir):
-    shutil.rmtree(workflow_dir)
+remove_directory(workflow_dir)
 os.mkdir(workflow_dir)
 
 engine = YADAGEEngine(config)
 
 wf = engine.create_workflow(sys.argv[1], {})
-while not wf['status'] in [WORKFLOW_ERROR, WORKFLOW_SUCCESS]:
+while not wf['status'] in TERMINAL_STATES:
     if len(wf['applicableRules']) > 0:
         print 'Apply rules: ' + str(wf['applicableRules'])
         wf = engine.apply_rules(wf['id'], wf['applicableRules'])
@@ -37,7 +50,7 @@ while not wf['status'] in [WORKFLOW_ERROR, WORKFLOW_SUCCESS]:
         print 'Submit nodes: ' + str(wf['submittableNodes'])
         wf = engine.submit_nodes(wf['id'], wf['submittableNodes'])
     elif wf['status'] == WORKFLOW_RUNNING:
-        time.sleep(5)
+        time.sleep(POLL_INTERVAL)
         wf = engine.get_workflow(wf['id'])
     else:
         print 'Status: ' + wf['status']
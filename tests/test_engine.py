@@ -2,13 +2,30 @@ import unittest
 import json
 import os
 import shutil
+import tempfile
+import time
 import urllib
 import urllib2
 import yaml
+from multiprocessing.pool import ThreadPool
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+from bson import BSON, SON
 from pymongo import MongoClient
-from yadageengine.engine import YADAGEEngine
-from yadageengine.workflow import WORKFLOW_IDLE
+from yadageengine.engine import YADAGEEngine, remove_directory
+from yadageengine.engine import compile_template_parameters, convert_list
+from yadageengine.engine import list_directory, MISSING_DEFAULT, ResponseCache
+from yadageengine.hateoas import UrlFactory
+import yadageengine.workflow
+from yadageengine.workflow import WorkflowInstance, WorkflowObjectCache
+from yadageengine.workflow import WORKFLOW_ERROR, WORKFLOW_IDLE
+from yadageengine.workflow import WORKFLOW_RUNNING, WORKFLOW_SUCCESS
+from yadageengine.workflow import compress_state, decompress_state
+from yadageengine.workflow import normalize_state, validate_selection
 
 
 """Assumes that the template server is running at the follwoing Url."""
@@ -16,6 +33,370 @@ TEMPLATE_REPOSITORY = 'http://localhost:25012/workflow-repository/api/v1/templat
 TEMPLATE_EXAMPLE = 'http://localhost:25012/workflow-repository/api/v1/templates/madgraph_rivet'
 CONFIG_FILE = './data/config.yaml'
 
+"""Workflow state used by tests that do not require a workflow template."""
+WORKFLOW_STATE = {
+    'dag' : {
+        'nodes' : [
+            {'id' : 'n1', 'name' : 'init', 'state' : 'SUCCESS', 'result' : 1.5}
+        ],
+        'edges' : []
+    },
+    'rules' : [{'identifier' : 'r1', 'name' : 'rule'}],
+    'applied' : [],
+    'bookkeeping' : {}
+}
+
+
+def reorder(obj):
+    """Get a copy of a Json object where the keys of all objects are in
+    reverse order. Simulates a serialized workflow whose key order differs
+    from the order of a state that was read from the database.
+    """
+    if isinstance(obj, dict):
+        return SON([(key, reorder(obj[key])) for key in reversed(sorted(obj))])
+    elif isinstance(obj, list):
+        return [reorder(value) for value in obj]
+    return obj
+
+
+class WorkflowObject(object):
+    """Replaces a deserialized Yadage workflow in tests."""
+    def __init__(self, state):
+        self.state = state
+
+    def json(self):
+        return reorder(self.state)
+
+
+class WorkflowController(object):
+    """Replaces the Yadage controller in tests of workflow instances. The
+    workflow is valid and running.
+    """
+    def __init__(self, model):
+        self.adageobj = model.load()
+
+    def applicable_rules(self):
+        return []
+
+    def submittable_nodes(self):
+        return []
+
+    def validate(self):
+        return True
+
+    def finished(self):
+        return False
+
+
+class WorkflowStore(object):
+    """Replaces the workflow repository in tests of workflow instances. Keeps
+    the BSON encoding of a single workflow state and records all updates,
+    status updates, and deserializations.
+    """
+    def __init__(self, state):
+        self.cache = WorkflowObjectCache(8)
+        self.document = BSON.encode(dict(state, _id='WF'))
+        self.deserialized = []
+        self.updates = []
+        self.status_updates = []
+
+    def deserializer(self, state):
+        obj = WorkflowObject(state)
+        self.deserialized.append(obj)
+        return obj
+
+    def get_workflow_state(self, workflow_id):
+        return BSON(self.document).decode()
+
+    def update_Workflow(self, workflow_id, data):
+        self.updates.append(data)
+        self.document = BSON.encode(dict(data, _id='WF'))
+
+    def update_workflow_status(self, identifier, status):
+        self.status_updates.append(status)
+
+    def workflow(self, status=WORKFLOW_SUCCESS):
+        metadata = {
+            '_id' : 'ID',
+            'name' : 'NAME',
+            'status' : status,
+            'createdAt' : '2017-01-01T00:00:00',
+            'workflow' : 'WF'
+        }
+        return WorkflowInstance(metadata, self, None)
+
+
+class TestWorkflowInstance(unittest.TestCase):
+
+    def test_commit_unchanged_state(self):
+        """Test that committing a loaded workflow without changes does not
+        write the state."""
+        store = WorkflowStore(WORKFLOW_STATE)
+        wf = store.workflow()
+        wf.commit(wf.load())
+        self.assertEquals(store.updates, [])
+        self.assertEquals(wf.state(), WORKFLOW_STATE)
+
+    def test_commit_modified_state(self):
+        """Test that committing a modified workflow writes the state."""
+        store = WorkflowStore(WORKFLOW_STATE)
+        wf = store.workflow()
+        obj = wf.load()
+        obj.state['dag']['nodes'][0]['state'] = 'FAILED'
+        wf.commit(obj)
+        self.assertEquals(len(store.updates), 1)
+        state = store.workflow().state()
+        self.assertEquals(state['dag']['nodes'][0]['state'], 'FAILED')
+
+    def test_load_cached_object(self):
+        """Test that a workflow object that was committed by one instance is
+        reused by the next instance that loads the same state."""
+        store = WorkflowStore(WORKFLOW_STATE)
+        wf = store.workflow()
+        obj = wf.load()
+        wf.commit(obj)
+        self.assertIs(store.workflow().load(), obj)
+        self.assertEquals(len(store.deserialized), 1)
+
+    def test_load_changed_state(self):
+        """Test that a cached workflow object is not reused if the state in
+        the repository has changed since the object was committed."""
+        store = WorkflowStore(WORKFLOW_STATE)
+        wf = store.workflow()
+        obj = wf.load()
+        wf.commit(obj)
+        state = json.loads(json.dumps(WORKFLOW_STATE))
+        state['dag']['nodes'][0]['state'] = 'FAILED'
+        store.update_Workflow('WF', state)
+        self.assertIsNot(store.workflow().load(), obj)
+        self.assertEquals(len(store.deserialized), 2)
+
+
+class TestWorkflowStatus(unittest.TestCase):
+
+    def setUp(self):
+        """Replace the Yadage controller."""
+        self.controller = yadageengine.workflow.PersistentController
+        yadageengine.workflow.PersistentController = WorkflowController
+
+    def tearDown(self):
+        yadageengine.workflow.PersistentController = self.controller
+
+    def test_successful_workflow(self):
+        """Test that successful workflows are not evaluated."""
+        store = WorkflowStore(WORKFLOW_STATE)
+        wf = store.workflow(WORKFLOW_SUCCESS)
+        self.assertIsNone(wf.controller)
+        self.assertEquals(wf.status, WORKFLOW_SUCCESS)
+        self.assertEquals(store.deserialized, [])
+
+    def test_error_workflow(self):
+        """Test that workflows in error state are evaluated again on load."""
+        store = WorkflowStore(WORKFLOW_STATE)
+        wf = store.workflow(WORKFLOW_ERROR)
+        self.assertIsNotNone(wf.controller)
+        self.assertEquals(wf.status, WORKFLOW_RUNNING)
+        self.assertEquals(store.status_updates, [WORKFLOW_RUNNING])
+
+
+class TestListDirectory(unittest.TestCase):
+
+    def setUp(self):
+        """Create directory tree a/b/c with one file on each level."""
+        self.base_dir = tempfile.mkdtemp()
+        self.urls = UrlFactory('http://localhost/')
+        path = self.base_dir
+        for name in ['a', 'b', 'c']:
+            with open(os.path.join(path, name + '.txt'), 'w') as f:
+                f.write(name)
+            path = os.path.join(path, name)
+            os.mkdir(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def test_unlimited_depth(self):
+        """Test that all levels are listed if there is no depth limit."""
+        files = list_directory(self.base_dir, 'WF', self.urls)
+        self.assertEquals([f['name'] for f in files], ['a', 'a.txt'])
+        self.assertEquals(files[1]['size'], 1)
+        self.assertEquals(files[1]['href'], self.urls.file_url('WF/a.txt'))
+        files = files[0]['files']
+        self.assertEquals([f['name'] for f in files], ['b', 'b.txt'])
+        self.assertEquals(files[1]['href'], self.urls.file_url('WF/a/b.txt'))
+        files = files[0]['files']
+        self.assertEquals([f['name'] for f in files], ['c', 'c.txt'])
+        self.assertEquals(files[0]['files'], [])
+        self.assertFalse('truncated' in files[0])
+
+    def test_limited_depth(self):
+        """Test that directories below the depth limit are truncated."""
+        files = list_directory(self.base_dir, 'WF', self.urls, depth=1)
+        self.assertEquals([f['name'] for f in files], ['a', 'a.txt'])
+        self.assertIsNone(files[0]['files'])
+        self.assertTrue(files[0]['truncated'])
+        files = list_directory(self.base_dir, 'WF', self.urls, depth=2)
+        self.assertEquals([f['name'] for f in files[0]['files']], ['b', 'b.txt'])
+        self.assertIsNone(files[0]['files'][0]['files'])
+        self.assertTrue(files[0]['files'][0]['truncated'])
+
+
+class TestTemplateParameters(unittest.TestCase):
+
+    def test_compile_parameters(self):
+        """Test converters and defaults for all parameter types."""
+        parameters = compile_template_parameters({
+            'parameters' : [
+                {'name' : 'n', 'type' : 'int', 'default' : 1},
+                {'name' : 'x', 'type' : 'float'},
+                {'name' : 's', 'type' : 'string', 'default' : None},
+                {'name' : 'ints', 'type' : 'array', 'items' : 'int'},
+                {'name' : 'floats', 'type' : 'array', 'items' : 'float'},
+                {'name' : 'strings', 'type' : 'array', 'items' : 'string'}
+            ]
+        })
+        self.assertEquals(
+            [(name, default) for name, _, default in parameters],
+            [
+                ('n', 1),
+                ('x', MISSING_DEFAULT),
+                ('s', None),
+                ('ints', MISSING_DEFAULT),
+                ('floats', MISSING_DEFAULT),
+                ('strings', MISSING_DEFAULT)
+            ]
+        )
+        converters = [converter for _, converter, _ in parameters]
+        self.assertEquals(converters[0]('2'), 2)
+        self.assertEquals(converters[1]('2.5'), 2.5)
+        self.assertIsNone(converters[2])
+        self.assertEquals(converters[3]('1,2'), [1, 2])
+        self.assertEquals(converters[4]('1.5,2'), [1.5, 2.0])
+        self.assertEquals(converters[5]('a,b'), ['a', 'b'])
+
+    def test_unknown_type(self):
+        """Test that unknown parameter and item types are rejected."""
+        with self.assertRaises(ValueError):
+            compile_template_parameters({
+                'parameters' : [{'name' : 'p', 'type' : 'bool'}]
+            })
+        with self.assertRaises(ValueError):
+            compile_template_parameters({
+                'parameters' : [{'name' : 'p', 'type' : 'array', 'items' : 'bool'}]
+            })
+
+    def test_convert_list(self):
+        """Test conversion of comma-separated lists."""
+        self.assertEquals(convert_list('a,b'), ['a', 'b'])
+        self.assertEquals(convert_list('1.5', converter=float), [1.5])
+        with self.assertRaises(ValueError):
+            convert_list('1,x', converter=int)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_expired_entry(self):
+        """Test that entries expire after the time to live."""
+        cache = ResponseCache(0.05, 8)
+        cache.put('A', {'id' : 'A'})
+        self.assertEquals(cache.get('A'), {'id' : 'A'})
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('A'))
+
+    def test_disabled_cache(self):
+        """Test that only final entries are cached if the time to live is not
+        positive."""
+        cache = ResponseCache(0, 8)
+        cache.put('A', {'id' : 'A'})
+        cache.put('B', {'id' : 'B'}, final=True)
+        self.assertIsNone(cache.get('A'))
+        self.assertEquals(cache.get('B'), {'id' : 'B'})
+
+    def test_final_entry(self):
+        """Test that final entries do not expire."""
+        cache = ResponseCache(0.05, 8)
+        cache.put('A', {'id' : 'A'}, final=True)
+        time.sleep(0.1)
+        self.assertEquals(cache.get('A'), {'id' : 'A'})
+
+    def test_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        cache = ResponseCache(60, 2)
+        cache.put('A', {'id' : 'A'})
+        cache.put('B', {'id' : 'B'}, final=True)
+        cache.get('A')
+        cache.put('C', {'id' : 'C'})
+        self.assertIsNone(cache.get('B'))
+        self.assertEquals(cache.get('A'), {'id' : 'A'})
+        self.assertEquals(cache.get('C'), {'id' : 'C'})
+
+
+class TestWorkflowObjectCache(unittest.TestCase):
+
+    def test_pop(self):
+        """Test that objects are only returned for an equal state and that
+        they are removed from the cache."""
+        cache = WorkflowObjectCache(8)
+        obj = object()
+        cache.put('WF', normalize_state(WORKFLOW_STATE), obj)
+        self.assertIsNone(cache.pop('WF', {'dag' : {}}))
+        cache.put('WF', normalize_state(WORKFLOW_STATE), obj)
+        self.assertIs(cache.pop('WF', reorder(WORKFLOW_STATE)), obj)
+        self.assertIsNone(cache.pop('WF', reorder(WORKFLOW_STATE)))
+
+    def test_remove_and_evict(self):
+        """Test removal and eviction of cached objects."""
+        cache = WorkflowObjectCache(2)
+        state = normalize_state(WORKFLOW_STATE)
+        cache.put('A', state, 'A')
+        cache.put('B', state, 'B')
+        cache.put('C', state, 'C')
+        cache.remove('B')
+        self.assertIsNone(cache.pop('A', state))
+        self.assertIsNone(cache.pop('B', state))
+        self.assertEquals(cache.pop('C', state), 'C')
+
+
+class TestStateCompression(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Test that a compressed state is restored with its identifier."""
+        document = compress_state(WORKFLOW_STATE)
+        self.assertFalse('dag' in document)
+        document['_id'] = 'WF'
+        self.assertEquals(
+            decompress_state(document),
+            dict(WORKFLOW_STATE, _id='WF')
+        )
+
+    def test_uncompressed_state(self):
+        """Test that uncompressed states are returned as they are."""
+        document = dict(WORKFLOW_STATE, _id='WF')
+        self.assertIs(decompress_state(document), document)
+        self.assertIsNone(decompress_state(None))
+
+
+class TestValidateSelection(unittest.TestCase):
+
+    def test_valid_selection(self):
+        """Test that a valid selection is returned as a set."""
+        selected = validate_selection([u'r1', u'r2'], ['r1', 'r2', 'r3'], 'invalid', 'duplicate')
+        self.assertEquals(selected, set(['r1', 'r2']))
+
+    def test_invalid_identifier(self):
+        """Test that all invalid identifier are listed in the error message,
+        including identifier with non-ASCII characters."""
+        with self.assertRaises(ValueError) as cm:
+            validate_selection([u'r1', u'\xfc', u'x'], ['r1'], 'invalid', 'duplicate')
+        self.assertEquals(str(cm.exception), 'invalid: x, \xc3\xbc')
+
+    def test_duplicate_identifier(self):
+        """Test that duplicate identifier are listed in the error message."""
+        with self.assertRaises(ValueError) as cm:
+            validate_selection([u'\xfc', u'r1', u'\xfc'], [u'r1', u'\xfc'], 'invalid', 'duplicate')
+        self.assertEquals(str(cm.exception), 'duplicate: \xc3\xbc')
+
+
 class TestYadageEngine(unittest.TestCase):
 
     def setUp(self):
@@ -23,21 +404,19 @@ class TestYadageEngine(unittest.TestCase):
         """
         # Read configuration
         with open(CONFIG_FILE, 'r') as f:
-            obj = yaml.load(f.read())
+            obj = yaml.load(f, Loader=SafeLoader)
         self.config = {kvp['key'] : kvp['value'] for kvp in obj['properties']}
         # Drop database
         MongoClient().drop_database(self.config['mongo.db'])
         # Drop workflow directory
         self.workflow_dir = self.config['db.workdir']
-        if os.path.isdir(self.workflow_dir):
-            shutil.rmtree(self.workflow_dir)
+        remove_directory(self.workflow_dir)
         os.mkdir(self.workflow_dir)
         self.engine = YADAGEEngine(self.config)
 
     def tearDown(self):
         #MongoClient().drop_database(self.config['mongo.db'])
-        if os.path.isdir(self.workflow_dir):
-            shutil.rmtree(self.workflow_dir)
+        remove_directory(self.workflow_dir)
 
     def test_apply_rules(self):
         """Test the create workflow from template functionality."""
@@ -84,9 +463,19 @@ class TestYadageEngine(unittest.TestCase):
         """Test the create workflow from template functionality."""
         templates = [
             temp['links'][0]['href']
-                for temp in json.loads(urllib.urlopen(TEMPLATE_REPOSITORY).read())['workflows']
+                for temp in json.load(urllib.urlopen(TEMPLATE_REPOSITORY))['workflows']
         ]
-        workflows = [self.engine.create_workflow(url, {}) for url in templates]
+        # Create workflows concurrently. Workflow creation is dominated by
+        # fetching the template and writing to the database.
+        pool = ThreadPool(8)
+        try:
+            workflows = pool.map(
+                lambda url: self.engine.create_workflow(url, {}),
+                templates
+            )
+        finally:
+            pool.close()
+            pool.join()
         wf_names = [self.engine.get_workflow(wf['id'])['name'] for wf in workflows]
         self.assertEquals(len(workflows), len(wf_names))
         for wf in workflows:
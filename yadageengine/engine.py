@@ -10,14 +10,59 @@ storage backend.
 The engine returns serialized resources, i.e., dictionaries.
 """
 
+from collections import OrderedDict
+import functools
 import json
 import os
 import shutil
-import urllib
+import threading
+import time
+import urllib2
 import logging
+import uuid
+import weakref
+import zlib
+
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
 
 from hateoas import UrlFactory, self_reference, hateoas_reference, HATEOAS_LINKS
-from workflow import WorkflowRepository, WORKFLOW_STATES
+from workflow import WorkflowRepository, WORKFLOW_STATES, WORKFLOW_TERMINAL_STATES
+
+
+# ------------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------------
+
+"""Converters for user-provided workflow parameter values by parameter type.
+Values of string parameters are not converted. Parameters without a default
+value are marked by MISSING_DEFAULT (None is a valid default value).
+"""
+PARAMETER_CONVERTERS = {'int' : int, 'float' : float, 'string' : None}
+MISSING_DEFAULT = object()
+
+# Timeout (in seconds) for requests that fetch workflow templates
+TEMPLATE_FETCH_TIMEOUT = 10
+
+# Number of seconds that fetched workflow templates are used without
+# re-validation and maximum number of cached templates
+TEMPLATE_CACHE_TTL = 300
+TEMPLATE_CACHE_SIZE = 128
+
+# Default number of seconds that serialized workflows are cached and the
+# maximum number of cached workflows. Cached workflows may be out of date with
+# respect to the backend. Caching of workflows that have not finished is
+# therefore disabled by default.
+DEFAULT_CACHE_TTL = 0
+RESPONSE_CACHE_SIZE = 1024
+
+# Infix of the names of directories of deleted workflows that have not been
+# removed yet
+TRASH_SUFFIX = '.deleted-'
 
 
 # ------------------------------------------------------------------------------
@@ -38,6 +83,11 @@ class YADAGEEngine(object):
         Repository of managed workflows
     description : dict
         Serialization of the Web service description
+    locks : weakref.WeakValueDictionary
+        Locks for workflows that are currently accessed, keyed by the workflow
+        identifier
+    responses : ResponseCache
+        Cache for serialized workflows
     urls : hateoas.URLFactory
         Factory for resource urls
     workflow_dir : string
@@ -51,16 +101,37 @@ class YADAGEEngine(object):
         * server.url : Base Url of the server where the app is running
         * server.port: Port the server is running on
         * app.doc : Url to web service documentation
+        * app.cachettl (optional) : Number of seconds that serialized workflows
+                                    are cached (default 0, i.e., only
+                                    workflows that have finished are cached)
         * db.workdir : Path to local directory for workflow files
         * mongo.db : Name of MongoDB database containing workflow state information
         * mongo.uri (optional): Uri containing MongoDB host and port
         """
         # Initialize the workflow repository
         self.db = WorkflowRepository(config)
+        # Operations on a workflow (including reads that synchronize the
+        # workflow state with the backend) load, modify, and commit the workflow
+        # state. Each workflow has its own lock to serialize these operations
+        # while operations on different workflows can run in parallel. Locks
+        # are only kept while they are in use.
+        self.locks = weakref.WeakValueDictionary()
+        self.locks_guard = threading.Lock()
+        # Serialized workflows are cached for a short period of time to serve
+        # clients that poll the workflow state
+        if 'app.cachettl' in config:
+            cache_ttl = config['app.cachettl']
+        else:
+            cache_ttl = DEFAULT_CACHE_TTL
+        self.responses = ResponseCache(cache_ttl, RESPONSE_CACHE_SIZE)
+        # Workflow templates that were fetched before, keyed by their Url. Each
+        # entry contains the expiry time, the ETag and Last-Modified header
+        # values (if any), the template document, and the compiled template
+        # parameters. Expired templates are re-validated on use.
+        self.templates = OrderedDict()
+        self.templates_lock = threading.Lock()
         # Initialize the Url Factory with the application Url
-        base_url = config['server.url']
-        if base_url.endswith('/'):
-            base_url = base_url[:-1]
+        base_url = config['server.url'].rstrip('/')
         server_port = config['server.port']
         if server_port != 80:
             base_url += ':' + str(server_port)
@@ -72,6 +143,9 @@ class YADAGEEngine(object):
         self.workflow_dir = os.path.abspath(config['db.workdir'])
         if not os.access(self.workflow_dir, os.F_OK):
             os.makedirs(self.workflow_dir)
+        # Delete directories of deleted workflows that were left behind when
+        # a previous process stopped while deleting them.
+        remove_trash_directories(self.workflow_dir)
 
         # The workflows listing Url is also used as Url for submitting workflow
         # run requests
@@ -114,15 +188,25 @@ class YADAGEEngine(object):
         dict
             Workflow instance or None
         """
-        # Get the workflow object. Return None if workflow does not exist.
-        workflow = self.db.get_workflow(workflow_id)
-        if workflow is None:
-            return None
-        # Apply selected rules. Will throw ValueError if any of the given rules
-        # is not applicable
-        workflow.apply_rules(rule_instances)
-        # Reload workflow object to get updated program state
-        return self.get_workflow(workflow_id)
+        with self.workflow_lock(workflow_id):
+            self.responses.remove(workflow_id)
+            # Get the workflow object. Return None if workflow does not exist.
+            workflow = self.db.get_workflow(workflow_id)
+            if workflow is None:
+                return None
+            # Apply selected rules. Will throw ValueError if any of the given
+            # rules is not applicable
+            workflow.apply_rules(rule_instances)
+            # Update the program state of the modified workflow object instead
+            # of reloading the workflow from the repository
+            workflow.update_status()
+            workflow = serialize_workflow(workflow, self.urls)
+            self.responses.put(
+                workflow_id,
+                workflow,
+                final=workflow['status'] in WORKFLOW_TERMINAL_STATES
+            )
+            return workflow
 
     def create_workflow(self, workflow_template_url, parameters={}, name=None):
         """Create a new workflow instance from the given workflow template.
@@ -146,43 +230,27 @@ class YADAGEEngine(object):
         """
         # Read the template at the given template URL
         try:
-            workflow_def = json.loads(urllib.urlopen(workflow_template_url).read())
+            document, template_parameters = self.fetch_workflow_template(
+                workflow_template_url
+            )
         except IOError as ex:
             logging.info('Fetching ' + workflow_template_url)
             logging.exception(ex)
             raise ValueError(ex)
-        # Construct dictionary of input data
+        workflow_def = json.loads(document)
+        # Construct dictionary of input data. Convert parameter values from
+        # strings to requested type
         init_data = {}
-        if 'parameters' in workflow_def:
-            for para in workflow_def['parameters']:
-                para_key = para['name']
-                para_value = None
-                if para_key in parameters:
-                    para_value = parameters[para_key]
-                elif 'default' in para:
-                    para_value = para['default']
-                else:
-                    raise ValueError('missing value for parameter: ' + para_key)
-                # TODO: Convert parameter values from strings to requested type
-                if para['type'] == 'int':
-                    para_value = int(para_value)
-                elif para['type'] == 'float':
-                    para_value = float(para_value)
-                elif para['type'] == 'array':
-                    value_list = para_value.split(',')
-                    para_value = []
-                    for val in value_list:
-                        if para['items'] == 'int':
-                            para_value.append(int(val))
-                        elif para['type'] == 'float':
-                            para_value.append(float(val))
-                        elif para['type'] == 'string':
-                            para_value.append(val)
-                        else:
-                            raise ValueError('missing value for list item: ' + val)
-                elif para['type'] != 'string':
-                    raise ValueError('unknown parameter type: ' + para['type'])
-                init_data[para_key] = para_value
+        for para_key, converter, default in template_parameters:
+            if para_key in parameters:
+                para_value = parameters[para_key]
+            elif not default is MISSING_DEFAULT:
+                para_value = default
+            else:
+                raise ValueError('missing value for parameter: ' + para_key)
+            if not converter is None:
+                para_value = converter(para_value)
+            init_data[para_key] = para_value
         # Use template name if no workflow name was provided or the give name
         # is empty
         workflow_name = name
@@ -191,12 +259,15 @@ class YADAGEEngine(object):
                 workflow_name = str(workflow_def['name'])
         else:
             workflow_name = str(workflow_def['name'])
-        # Create the workflow and return descriptor
+        # Create the workflow and return descriptor. The new workflow is
+        # initialized (and its state committed) while holding the workflow
+        # lock, i.e., listings that find the workflow wait for it.
         return serialize_workflow(
             self.db.create_workflow(
                 workflow_def['schema'],
                 workflow_name,
-                init_data
+                init_data,
+                lock=self.workflow_lock
             ),
             self.urls
         )
@@ -215,16 +286,116 @@ class YADAGEEngine(object):
         Boolean
             True, if worlflow was deleted, False if not found.
         """
+        with self.workflow_lock(workflow_id):
+            self.responses.remove(workflow_id)
+            deleted = self.db.delete_workflow(workflow_id)
         # Remove workflow directory if workflow exists
-        if self.db.delete_workflow(workflow_id):
-            try:
-                shutil.rmtree(os.path.join(self.workflow_dir, workflow_id))
-            except OSError as ex:
-                pass
+        if deleted:
+            remove_directory(os.path.join(self.workflow_dir, workflow_id))
             return True
         else:
             return False
 
+    def fetch_workflow_template(self, url):
+        """Get the workflow template document at the given Url together with
+        the compiled list of template parameters. Templates are cached by their
+        Url and used without contacting the server for TEMPLATE_CACHE_TTL
+        seconds. After that the request is conditional (if the response
+        contained an ETag or Last-Modified header) and the cached template is
+        used if the server responds with 304 (Not Modified). Templates are
+        requested with gzip content encoding.
+
+        Returns the document text. The result is parsed by the caller for
+        every new workflow since the workflow object references (and may
+        modify) parts of the template.
+
+        Raises ValueError if the template contains a parameter of unknown type.
+
+        Parameters
+        ----------
+        url : string
+            Url for workflow template
+
+        Returns
+        -------
+        (string, list((string, func, object)))
+        """
+        with self.templates_lock:
+            entry = self.templates.get(url)
+        if not entry is None and entry[0] > time.time():
+            return entry[3], entry[4]
+        request = urllib2.Request(url)
+        request.add_header('Accept-Encoding', 'gzip')
+        if not entry is None:
+            _, etag, last_modified, _, _ = entry
+            if not etag is None:
+                request.add_header('If-None-Match', etag)
+            if not last_modified is None:
+                request.add_header('If-Modified-Since', last_modified)
+        try:
+            response = urllib2.urlopen(request, timeout=TEMPLATE_FETCH_TIMEOUT)
+        except urllib2.HTTPError as ex:
+            if ex.code == 304 and not entry is None:
+                _, etag, last_modified, document, template_parameters = entry
+                self.cache_workflow_template(
+                    url,
+                    etag,
+                    last_modified,
+                    document,
+                    template_parameters
+                )
+                return document, template_parameters
+            raise
+        try:
+            document = response.read()
+            headers = response.info()
+            if headers.getheader('Content-Encoding') == 'gzip':
+                document = zlib.decompress(document, 16 + zlib.MAX_WBITS)
+            etag = headers.getheader('ETag')
+            last_modified = headers.getheader('Last-Modified')
+        finally:
+            response.close()
+        template_parameters = compile_template_parameters(json.loads(document))
+        self.cache_workflow_template(
+            url,
+            etag,
+            last_modified,
+            document,
+            template_parameters
+        )
+        return document, template_parameters
+
+    def cache_workflow_template(
+        self, url, etag, last_modified, document, template_parameters
+    ):
+        """Add workflow template to the template cache. Evicts the least
+        recently added template if the cache is full.
+
+        Parameters
+        ----------
+        url : string
+            Url for workflow template
+        etag : string
+            Value of the ETag response header (or None)
+        last_modified : string
+            Value of the Last-Modified response header (or None)
+        document : string
+            Template document
+        template_parameters : list((string, func, object))
+            Compiled list of template parameters
+        """
+        with self.templates_lock:
+            self.templates.pop(url, None)
+            self.templates[url] = (
+                time.time() + TEMPLATE_CACHE_TTL,
+                etag,
+                last_modified,
+                document,
+                template_parameters
+            )
+            while len(self.templates) > TEMPLATE_CACHE_SIZE:
+                self.templates.popitem(last=False)
+
     def get_description(self):
         """Descriptive object for Web API. Contains the API name and a list of
         references to list workflows and to submit new workflows. Also contains
@@ -240,7 +411,9 @@ class YADAGEEngine(object):
     def get_workflow(self, workflow_id):
         """Get workflow instance with the given identifier.
 
-        Result is None if the workflow does not exist.
+        Result is None if the workflow does not exist. The serialized workflow
+        may be taken from the response cache, i.e., it may not reflect changes
+        in the workflow state that happened within the cache period.
 
         Parameters
         ----------
@@ -252,7 +425,20 @@ class YADAGEEngine(object):
         dict
             Workflow instance object or None
         """
-        return serialize_workflow(self.db.get_workflow(workflow_id), self.urls)
+        with self.workflow_lock(workflow_id):
+            workflow = self.responses.get(workflow_id)
+            if workflow is None:
+                workflow = serialize_workflow(
+                    self.db.get_workflow(workflow_id),
+                    self.urls
+                )
+                if not workflow is None:
+                    self.responses.put(
+                        workflow_id,
+                        workflow,
+                        final=workflow['status'] in WORKFLOW_TERMINAL_STATES
+                    )
+            return workflow
 
     def get_workflow_stats(self):
         """Get a count of workflows in the database by workflow status.
@@ -262,7 +448,9 @@ class YADAGEEngine(object):
         dict
             Object containing dictionary of workflow status counts
         """
-        return {'statistics' : self.db.get_workflow_stats()}
+        return {
+            'statistics' : self.db.get_workflow_stats(lock=self.workflow_lock)
+        }
 
     def list_workflows(self, query=None):
         """Get a list of all workflows currently managed by the engine.
@@ -272,17 +460,30 @@ class YADAGEEngine(object):
         dict
             Listing of workflow descriptors
         """
+        # Serialize workflow descriptors inline. The listing is the hot path
+        # for clients polling the engine and may contain many workflows.
+        workflow_url = self.urls.workflow_url
         return {
             'workflows': [
-                serialize_workflow_descriptor(wf, self.urls)
-                    for wf in self.db.list_workflows(status=query)
+                {
+                    'id' : wf.identifier,
+                    'name' : wf.name,
+                    'status' : wf.status,
+                    'createdAt' : wf.createdAt,
+                    HATEOAS_LINKS : [
+                        {'rel' : 'self', 'href' : workflow_url(wf.identifier)}
+                    ]
+                } for wf in self.db.list_workflows(
+                    status=query,
+                    lock=self.workflow_lock
+                )
             ],
             HATEOAS_LINKS: [
                 self_reference(self.urls.workflow_list_url())
             ]
         }
 
-    def list_workflow_files(self, workflow_id):
+    def list_workflow_files(self, workflow_id, depth=None):
         """Get recursive directory listing for workflow.
 
         Result is None if workflow does not exist.
@@ -292,6 +493,9 @@ class YADAGEEngine(object):
         workflow_id : string
             Unique identifier of workflow for which the files and file structure
             is returned.
+        depth : int, optional
+            Number of directory levels to list. The full directory tree is
+            listed if depth is None.
 
         Returns
         -------
@@ -302,7 +506,8 @@ class YADAGEEngine(object):
             'files' : list_directory(
                 os.path.join(self.workflow_dir, workflow_id),
                 workflow_id,
-                self.urls
+                self.urls,
+                depth=depth
             )
         }
 
@@ -325,23 +530,258 @@ class YADAGEEngine(object):
         dict
             Workflow instance or None
         """
-        # Get the workflow object. Return None if workflow does not exist.
-        workflow = self.db.get_workflow(workflow_id)
-        if workflow is None:
-            return None
-        # Apply selected rules. Will throw ValueError if any of the given rules
-        # is not applicable
-        workflow.submit_nodes(node_ids)
-        # Reload workflow object to get updated program state
-        return self.get_workflow(workflow_id)
+        with self.workflow_lock(workflow_id):
+            self.responses.remove(workflow_id)
+            # Get the workflow object. Return None if workflow does not exist.
+            workflow = self.db.get_workflow(workflow_id)
+            if workflow is None:
+                return None
+            # Submit selected nodes. Will throw ValueError if any of the given
+            # nodes is not submittable
+            workflow.submit_nodes(node_ids)
+            # Update the program state of the modified workflow object instead
+            # of reloading the workflow from the repository
+            workflow.update_status()
+            workflow = serialize_workflow(workflow, self.urls)
+            self.responses.put(
+                workflow_id,
+                workflow,
+                final=workflow['status'] in WORKFLOW_TERMINAL_STATES
+            )
+            return workflow
+
+    def workflow_lock(self, workflow_id):
+        """Get the lock for the workflow with the given identifier. The lock is
+        re-entrant, i.e., a thread that holds the lock may call other engine
+        methods for the same workflow.
+
+        Parameters
+        ----------
+        workflow_id : string
+            Unique workflow identifier
+
+        Returns
+        -------
+        threading.RLock
+        """
+        with self.locks_guard:
+            lock = self.locks.get(workflow_id)
+            if lock is None:
+                lock = threading.RLock()
+                self.locks[workflow_id] = lock
+            return lock
+
+
+# ------------------------------------------------------------------------------
+#
+# Response Cache
+#
+# ------------------------------------------------------------------------------
+
+class ResponseCache(object):
+    """Size-bounded cache for serialized workflows. Entries expire after a
+    given number of seconds. The cache is disabled if the time to live is not
+    positive.
+
+    Workflows in a terminal state do not change anymore. Their entries are
+    final, i.e., they do not expire and are cached independently of the time
+    to live. Final entries are only removed when the workflow is deleted or
+    when they are evicted. Entries are evicted in least recently used order.
+
+    Serialized workflows are returned to the client as they are, i.e., cached
+    objects are never modified.
+    """
+    def __init__(self, ttl, size):
+        """Initialize the time to live for cache entries and the maximum cache
+        size.
+
+        Parameters
+        ----------
+        ttl : float
+            Number of seconds that entries are kept
+        size : int
+            Maximum number of cache entries
+        """
+        self.ttl = ttl
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Get the cached object for the given key. Returns None if no entry
+        exists or if the entry has expired.
+
+        Parameters
+        ----------
+        key : string
+            Cache key
+
+        Returns
+        -------
+        dict
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            del self.entries[key]
+            if not entry[0] is None and entry[0] <= time.time():
+                return None
+            self.entries[key] = entry
+            return entry[1]
+
+    def put(self, key, obj, final=False):
+        """Add object to the cache. Evicts the least recently used entry if
+        the cache is full.
+
+        Parameters
+        ----------
+        key : string
+            Cache key
+        obj : dict
+            Serialized object
+        final : bool, optional
+            Flag indicating whether the entry never expires
+        """
+        if final:
+            expires = None
+        elif self.ttl > 0:
+            expires = time.time() + self.ttl
+        else:
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (expires, obj)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def remove(self, key):
+        """Remove the entry for the given key (if any).
+
+        Parameters
+        ----------
+        key : string
+            Cache key
+        """
+        with self.lock:
+            self.entries.pop(key, None)
 
 
 # ------------------------------------------------------------------------------
 # Helper Methods
 # ------------------------------------------------------------------------------
 
-def list_directory(directory_name, relative_path, urls):
-    """Recursive listing of all files in the given directory.
+def remove_directory(directory):
+    """Remove the given directory (if it exists). The directory is renamed
+    first and the renamed directory is deleted in a background thread. The
+    workflow directory is therefore gone once this method returns, even if
+    deleting a large number of workflow files takes a while.
+
+    Parameters
+    ----------
+    directory : string
+        Path to directory
+    """
+    trash_dir = directory + TRASH_SUFFIX + uuid.uuid4().hex
+    try:
+        os.rename(directory, trash_dir)
+    except OSError:
+        return
+    threading.Thread(
+        target=shutil.rmtree,
+        args=(trash_dir,),
+        kwargs={'ignore_errors' : True}
+    ).start()
+
+
+def remove_trash_directories(workflow_dir):
+    """Delete all renamed directories of deleted workflows (see
+    remove_directory) in the given workflow directory. The directories are
+    deleted in a background thread.
+
+    Parameters
+    ----------
+    workflow_dir : string
+        Base directory for all workflow files
+    """
+    trash_dirs = [
+        entry.path for entry in scandir(workflow_dir)
+            if TRASH_SUFFIX in entry.name and entry.is_dir(follow_symlinks=False)
+    ]
+    if len(trash_dirs) == 0:
+        return
+    def remove_all():
+        for trash_dir in trash_dirs:
+            shutil.rmtree(trash_dir, ignore_errors=True)
+    threading.Thread(target=remove_all).start()
+
+
+def compile_template_parameters(workflow_def):
+    """Get list of parameters for a workflow template. Each parameter is
+    represented by a tuple of parameter name, converter for the user-provided
+    value (None if no conversion is necessary), and default value. The default
+    value is MISSING_DEFAULT for parameters without a default.
+
+    Raises ValueError if the template contains a parameter of unknown type.
+
+    Parameters
+    ----------
+    workflow_def : dict
+        Workflow template
+
+    Returns
+    -------
+    list((string, func, object))
+    """
+    result = []
+    if 'parameters' in workflow_def:
+        for para in workflow_def['parameters']:
+            para_type = para['type']
+            if para_type == 'array':
+                item_type = para['items']
+                if not item_type in PARAMETER_CONVERTERS:
+                    raise ValueError('unknown list item type: ' + item_type)
+                converter = functools.partial(
+                    convert_list,
+                    converter=PARAMETER_CONVERTERS[item_type]
+                )
+            elif para_type in PARAMETER_CONVERTERS:
+                converter = PARAMETER_CONVERTERS[para_type]
+            else:
+                raise ValueError('unknown parameter type: ' + para_type)
+            if 'default' in para:
+                default = para['default']
+            else:
+                default = MISSING_DEFAULT
+            result.append((para['name'], converter, default))
+    return result
+
+
+def convert_list(value, converter=None):
+    """Convert a comma-separated list of values.
+
+    Parameters
+    ----------
+    value : string
+        Comma-separated list of values
+    converter : func, optional
+        Converter for list items
+
+    Returns
+    -------
+    list
+    """
+    values = value.split(',')
+    if converter is None:
+        return values
+    return [converter(val) for val in values]
+
+
+def list_directory(directory_name, relative_path, urls, depth=None):
+    """Recursive listing of all files in the given directory. The listing
+    stops after the given number of directory levels. Directories at the
+    lowest listed level are not expanded. Their list of files is None and they
+    are marked as truncated.
 
     Parameters
     ----------
@@ -352,6 +792,8 @@ def list_directory(directory_name, relative_path, urls):
         contains all workflow data files.
     urls : hateoas.UrlFactory
         Factory for resource urls
+    depth : int, optional
+        Number of directory levels to list. There is no limit if None.
 
     Returns
     -------
@@ -360,7 +802,8 @@ def list_directory(directory_name, relative_path, urls):
         file : {
             'type', : 'DIRECTORY',
             'name': ...,
-            'files' : [{file}]
+            'files' : [{file}] or None,
+            'truncated' : True (only if files is None)
         }
         or
         file : {
@@ -370,25 +813,41 @@ def list_directory(directory_name, relative_path, urls):
             'href': ...
         }
     """
-    files = []
-    for filename in os.listdir(directory_name):
-        abs_path = os.path.join(directory_name, filename)
-        if os.path.isdir(abs_path):
-            descriptor = {
-                'type' : 'DIRECTORY',
-                'name': filename,
-                'files' : list_directory(abs_path, relative_path + '/' + filename, urls)
-            }
-        else:
-            descriptor = {
-                'type': 'FILE',
-                'name': filename,
-                'size': os.stat(abs_path).st_size,
-                'href': urls.file_url(relative_path + '/' + filename)
-            }
-        files.append(descriptor)
-    files.sort(key=lambda descriptor: descriptor['name'])
-    return files
+    result = []
+    # Traverse the directory tree iteratively. Each item on the stack contains
+    # the absolute and relative path of a directory, the remaining number of
+    # levels to list, and the list that receives the directory entries.
+    stack = [(directory_name, relative_path, depth, result)]
+    while len(stack) > 0:
+        dir_path, dir_relative_path, dir_depth, files = stack.pop()
+        # Use scandir instead of listdir to avoid separate stat() calls for
+        # each entry. The entry type is taken from the directory listing itself
+        # and the entry is only stat'ed for file sizes.
+        for entry in scandir(dir_path):
+            filename = entry.name
+            if entry.is_dir():
+                descriptor = {'type' : 'DIRECTORY', 'name': filename}
+                if dir_depth is None or dir_depth > 1:
+                    descriptor['files'] = []
+                    stack.append((
+                        entry.path,
+                        dir_relative_path + '/' + filename,
+                        dir_depth - 1 if not dir_depth is None else None,
+                        descriptor['files']
+                    ))
+                else:
+                    descriptor['files'] = None
+                    descriptor['truncated'] = True
+            else:
+                descriptor = {
+                    'type': 'FILE',
+                    'name': filename,
+                    'size': entry.stat().st_size,
+                    'href': urls.file_url(dir_relative_path + '/' + filename)
+                }
+            files.append(descriptor)
+        files.sort(key=lambda descriptor: descriptor['name'])
+    return result
 
 
 def serialize_workflow(workflow, urls):
@@ -418,66 +877,17 @@ def serialize_workflow(workflow, urls):
     # Ensure that workflow is defined
     if workflow is None:
         return None
-    workflow_url = urls.workflow_url(workflow.identifier)
+    workflow_id = workflow.identifier
+    state = workflow.state()
     return {
-        'id' : workflow.identifier,
+        'id' : workflow_id,
         'name' : workflow.name,
         'status' : workflow.status,
         'createdAt' : workflow.createdAt,
         'applicableRules' : workflow.applicable_rules,
         'submittableNodes' : workflow.submittable_nodes,
-        'dag' : workflow.json()['dag'],
-        'rules': workflow.json()['rules'],
-        'appliedRules' : workflow.json()['applied'],
-        HATEOAS_LINKS : [
-            self_reference(workflow_url),
-            hateoas_reference('delete', workflow_url),
-            hateoas_reference(
-                'files',
-                urls.workflow_list_files_url(workflow.identifier)
-            ),
-            hateoas_reference(
-                'applyRules',
-                urls.workflow_apply_rules_url(workflow.identifier)
-            ),
-            hateoas_reference('delete', workflow_url),
-            hateoas_reference(
-                'submitNodes',
-                urls.workflow_submit_nodes_url(workflow.identifier)
-            ),
-            hateoas_reference('list', urls.workflow_list_url()),
-        ]
-    }
-
-
-def serialize_workflow_descriptor(workflow, urls):
-    """Serilaize workflow descriptor. Returns a dictionary that contains the
-    workflow id, name, state, and a reference to the workflow resource.
-
-    Returns None if workflow is not defined.
-
-    Parameters
-    ----------
-    workflow : workflow.WorkflowInstance
-        Workflow descriptor object
-
-    urls : hateoas.UrlFactory
-        Factory for resource urls
-
-    Results
-    -------
-    dict
-        Serialization of workflow descriptor
-    """
-    # Ensure that workflow is defined
-    if workflow is None:
-        return None
-    return {
-        'id' : workflow.identifier,
-        'name' : workflow.name,
-        'status' : workflow.status,
-        'createdAt' : workflow.createdAt,
-        HATEOAS_LINKS : [
-            self_reference(urls.workflow_url(workflow.identifier))
-        ]
+        'dag' : state['dag'],
+        'rules': state['rules'],
+        'appliedRules' : state['applied'],
+        HATEOAS_LINKS : urls.workflow_references(workflow_id)
     }
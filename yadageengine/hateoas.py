@@ -14,6 +14,9 @@ module contains all methods to generate HATEOAS references for API resources.
 # Json element name for HATEOAS reference lists
 HATEOAS_LINKS = 'links'
 
+# Url query parameter for the depth of workflow file listings
+PARA_DEPTH = 'depth'
+
 # Url query parameter for workflow statuses
 PARA_STATUS = 'status'
 
@@ -22,7 +25,7 @@ PARA_STATUS = 'status'
 # Url factory
 # ------------------------------------------------------------------------------
 
-class UrlFactory:
+class UrlFactory(object):
     """Class that captures the definitions of Url's for any resource that is
     accessible through the Web API.
 
@@ -30,9 +33,15 @@ class UrlFactory:
     ----------
     base_url : string
         Prefix for all resource Url's
-    doc_url : string
-        Url to API documentation
+    files_prefix : string
+        Prefix for Url's of workflow files
+    workflows_url : string
+        Url for workflow resources listing
+    workflow_prefix : string
+        Prefix for Url's of individual workflow resources
     """
+    __slots__ = ('base_url', 'files_prefix', 'workflows_url', 'workflow_prefix')
+
     def __init__(self, base_url):
         """Intialize the common Url prefix and the reference to the API
         documentation.
@@ -44,13 +53,12 @@ class UrlFactory:
         doc_url : string
             Url to API documentation
         """
-        self.base_url = base_url
         # Ensure that base_url does not end with a slash
-        while len(self.base_url) > 0:
-            if self.base_url[-1] == '/':
-                self.base_url = self.base_url[:-1]
-            else:
-                break
+        self.base_url = base_url.rstrip('/')
+        # Prefixes that are shared by many of the resource Url's
+        self.files_prefix = self.base_url + '/files/'
+        self.workflows_url = self.base_url + '/workflows'
+        self.workflow_prefix = self.workflows_url + '/'
 
     def file_url(self, path):
         """Url to download a workflow (output) file at the given path.
@@ -66,7 +74,7 @@ class UrlFactory:
         string
             Url to file resource
         """
-        return self.base_url + '/files/' + path
+        return self.files_prefix + path
 
     def workflow_apply_rules_url(self, workflow_id):
         """Url for an apply rules request for a given workflow.
@@ -107,7 +115,35 @@ class UrlFactory:
         string
             Url for workflow resources listing.
         """
-        return self.base_url + '/workflows'
+        return self.workflows_url
+
+    def workflow_references(self, workflow_id):
+        """List of HATEOAS references for a serialized workflow resource. The
+        list contains references to the workflow ('self' and 'delete'), the
+        workflow files ('files'), the apply rules and submit nodes actions
+        ('applyRules', 'submitNodes'), and the workflow listing ('list').
+
+        All references are derived from a single workflow Url.
+
+        Parameters
+        ----------
+        workflow_id : string
+            Unique identifier of workflow resource
+
+        Returns
+        -------
+        list(dict)
+        """
+        workflow_url = self.workflow_prefix + workflow_id
+        return [
+            {'rel' : 'self', 'href' : workflow_url},
+            {'rel' : 'delete', 'href' : workflow_url},
+            {'rel' : 'files', 'href' : workflow_url + '/files'},
+            {'rel' : 'applyRules', 'href' : workflow_url + '/apply'},
+            {'rel' : 'delete', 'href' : workflow_url},
+            {'rel' : 'submitNodes', 'href' : workflow_url + '/submit'},
+            {'rel' : 'list', 'href' : self.workflows_url}
+        ]
 
     def workflow_stats_url(self):
         """Url to retrieve a summary of workflows by state.
@@ -128,7 +164,7 @@ class UrlFactory:
         string
             Url for workflow resources listing.
         """
-        return self.workflow_list_url() + '?' + PARA_STATUS + '=' + status
+        return self.workflows_url + '?' + PARA_STATUS + '=' + status
 
     def workflow_submit_nodes_url(self, workflow_id):
         """Url for an submit nodes request for a given workflow.
@@ -158,7 +194,7 @@ class UrlFactory:
         string
             Url to workflow resource
         """
-        return self.workflow_list_url() + '/' + str(workflow_id)
+        return self.workflow_prefix + workflow_id
 
 
 # ------------------------------------------------------------------------------
@@ -197,4 +233,4 @@ def self_reference(url):
     dict
         Dictionary containing elements 'rel' and 'href'
     """
-    return hateoas_reference('self', url)
+    return {'rel' : 'self', 'href' : url}
@@ -7,14 +7,47 @@ represents a thin layer around the Yadage Engine API that wraps all relevant API
 methods for users to interact with the workflow engine via Http requests.
 """
 
-from flask import Flask, abort, jsonify, make_response, request, send_from_directory
+from flask import Flask, Response, abort, jsonify, make_response, request, send_from_directory
 from flask_cors import CORS
 import os
 from pymongo import MongoClient
 import urllib2
 import yaml
 
-from hateoas import PARA_STATUS
+# Use the libyaml parser for configuration files if it is available
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Workflow resources contain the full workflow DAG and file listings can be
+# large. Use ujson to encode responses if it is installed and fall back to the
+# standard library otherwise. ujson rounds floats to a fixed number of
+# decimals (10 by default). Use the maximum precision to keep results in the
+# workflow DAG intact.
+try:
+    import ujson
+
+    def json_dumps(obj):
+        return ujson.dumps(
+            obj,
+            escape_forward_slashes=False,
+            double_precision=15
+        )
+except ImportError:
+    import json
+
+    def json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+# Compress large responses (e.g., workflow resources and file listings) if the
+# optional Flask-Compress extension is installed.
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
+from hateoas import PARA_DEPTH, PARA_STATUS
 from engine import YADAGEEngine
 
 
@@ -41,17 +74,20 @@ WEB_CONFIG_FILE_URI = 'https://raw.githubusercontent.com/heikomuller/yadage-engi
 # variable is not set a file 'config.yaml' in the current working directory
 # will be used. The default configuration is read first from the GitHub
 # repository. Default values are overwritten by local configurations (if any).
-def_conf = yaml.load(urllib2.urlopen(WEB_CONFIG_FILE_URI).read())['properties']
+def_conf = yaml.load(
+    urllib2.urlopen(WEB_CONFIG_FILE_URI).read(),
+    Loader=SafeLoader
+)['properties']
 config = {kvp['key'] : kvp['value'] for kvp in def_conf}
 config = {}
 LOCAL_CONFIG_FILE = os.getenv(ENV_CONFIG)
 obj = None
 if not LOCAL_CONFIG_FILE is None and os.path.isfile(LOCAL_CONFIG_FILE):
     with open(LOCAL_CONFIG_FILE, 'r') as f:
-        obj = yaml.load(f.read())
+        obj = yaml.load(f, Loader=SafeLoader)
 elif os.path.isfile('./config.yaml'):
     with open('./config.yaml', 'r') as f:
-        obj = yaml.load(f.read())
+        obj = yaml.load(f, Loader=SafeLoader)
 if not obj is None:
     for kvp in obj['properties']:
         config[kvp['key']] = kvp['value']
@@ -64,6 +100,7 @@ if not obj is None:
 # app.doc : Url to web service documentation
 # app.debug: Switch debugging ON/OFF
 # app.logdir : Directory for log files
+# app.xsendfile* : Let the front-end Web server send workflow files
 # db.workdir : Path to local directory for workflow files
 # mongo.db : Name of MongoDB database containing workflow state information
 # mongo.uri (optional): Uri containing MongoDB host and port (e.g.,
@@ -97,6 +134,10 @@ if not DEBUG:
 
 api = YADAGEEngine(config)
 
+# The service description does not change after startup. Encode it once and
+# send the same response body for every request to the welcome resource.
+WELCOME_MESSAGE = json_dumps(api.get_description())
+
 
 # ------------------------------------------------------------------------------
 # Initialize the Web app
@@ -106,9 +147,22 @@ api = YADAGEEngine(config)
 engine_app = Flask(__name__, static_url_path=WORK_BASE)
 engine_app.config['APPLICATION_ROOT'] = config['server.apppath']
 engine_app.config['DEBUG'] = DEBUG
+# Responses are encoded by json_response. Do not sort keys or pretty print
+# the remaining (error) responses that are generated by jsonify.
+engine_app.config['JSON_SORT_KEYS'] = False
+engine_app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+# Workflow files are sent by the front-end Web server (using the X-Sendfile
+# header) if enabled. Requires a server that supports the header, e.g., Apache
+# with mod_xsendfile.
+if 'app.xsendfile' in config:
+    engine_app.config['USE_X_SENDFILE'] = config['app.xsendfile']
 #if not LOG_DIR is None:
 #    engine_app.config['LOG_DIR'] = LOG_DIR
 CORS(engine_app)
+# Responses that are smaller than the minimum size are sent uncompressed.
+if not Compress is None:
+    engine_app.config['COMPRESS_MIN_SIZE'] = 1024
+    Compress(engine_app)
 
 
 # ------------------------------------------------------------------------------
@@ -124,7 +178,7 @@ def get_welcome():
     Main object for the web service. Contains the service name and a list of
     references for clients to interact with the API.
     """
-    return jsonify(api.get_description())
+    return Response(WELCOME_MESSAGE, mimetype='application/json')
 
 
 @engine_app.route('/files/<path:path>')
@@ -146,7 +200,7 @@ def list_workflows():
     # Check if a filter query argument was given in the request
     query = request.args[PARA_STATUS] if PARA_STATUS in request.args else None
     # Get list of worklows and return a list of workflow descriptors
-    return jsonify(api.list_workflows(query=query))
+    return json_response(api.list_workflows(query=query))
 
 
 @engine_app.route('/workflows', methods=['POST'])
@@ -156,24 +210,25 @@ def create_workflow():
     Handles request to run a workflow template.
     """
     # Abort with BAD REQUEST if the request body is not in Json format orelse
-    # does not contain a reference to a workflow template
-    if not request.json:
+    # does not contain a reference to a workflow template. The request body is
+    # parsed once and not cached with the request.
+    json_obj = request.get_json(silent=True, cache=False)
+    if not json_obj or not isinstance(json_obj, dict):
         abort(400)
     # Get the Url for the workflow template
-    if not 'template' in request.json:
+    template_url = json_obj.get('template')
+    if template_url is None:
         abort(400)
-    template_url = request.json['template']
     # Get dictionary of user provided input data (if given)
     parameters = {}
-    if 'parameters' in request.json:
-        for para in request.json['parameters']:
-            if not 'key' in para or not 'value' in para:
-                abort(400)
-            parameters[para['key']] = para['value']
+    for para in json_obj.get('parameters', []):
+        if not 'key' in para or not 'value' in para:
+            abort(400)
+        parameters[para['key']] = para['value']
     # Get the user provided workflow name.
-    name = None
-    if 'name' in request.json:
-        name = request.json['name'].strip()
+    name = json_obj.get('name')
+    if not name is None:
+        name = name.strip()
     # Submit request to workflow engine
     try:
         workflow = api.create_workflow(
@@ -182,7 +237,7 @@ def create_workflow():
             name=name
         )
         # Send response with code 201 (HTTP Created)
-        return jsonify(workflow), 201
+        return json_response(workflow, 201)
     except ValueError as ex:
         abort(400)
 
@@ -194,7 +249,7 @@ def get_workflow_stats():
     Returns a summary of workflow statuses for workflows currently managed by
     the workflow engine.
     """
-    return jsonify(api.get_workflow_stats())
+    return json_response(api.get_workflow_stats())
 
 
 @engine_app.route('/workflows/<string:workflow_id>')
@@ -207,7 +262,7 @@ def get_workflow(workflow_id):
     workflow = api.get_workflow(workflow_id)
     if workflow is None:
         abort(404)
-    return jsonify(workflow)
+    return json_response(workflow)
 
 
 @engine_app.route('/workflows/<string:workflow_id>', methods=['DELETE'])
@@ -234,20 +289,21 @@ def apply_rules(workflow_id):
     """
     # Abort with BAD REQUEST if the request body is not in Json format or
     # does not contain a reference to a list of appliable rules
-    if not request.json:
+    json_obj = request.get_json(silent=True, cache=False)
+    if not json_obj or not isinstance(json_obj, dict):
         abort(400)
-    json_obj = request.json
-    if not 'rules' in json_obj:
+    rules = json_obj.get('rules')
+    if rules is None:
         abort(400)
     # Apply rule instances to given workflow. The result is None if the
     # workflow does not exist. THe method throws a ValueError if any of the
     # selected rules is not applicable.
     try:
-        workflow = api.apply_rules(workflow_id, json_obj['rules'])
+        workflow = api.apply_rules(workflow_id, rules)
         if workflow is None:
             abort(404)
         # Return the descriptor of the modified workflow.
-        return jsonify(workflow)
+        return json_response(workflow)
     except ValueError as ex:
         print 'ERROR'
         print ex
@@ -258,14 +314,26 @@ def apply_rules(workflow_id):
 def list_workflow_files(workflow_id):
     """GET - Workflow directory listing
 
-    Recursive listing of all files in the workflow working directory.
+    Recursive listing of all files in the workflow working directory. The
+    optional query parameter depth limits the number of listed directory
+    levels.
     """
+    # Get the maximum listing depth (if given). Abort with BAD REQUEST if the
+    # value is not a positive integer.
+    depth = None
+    if PARA_DEPTH in request.args:
+        try:
+            depth = int(request.args[PARA_DEPTH])
+        except ValueError:
+            abort(400)
+        if depth < 1:
+            abort(400)
     # Get a list of workflow files. The result is None if the workflow does
     # not exists.
-    files = api.list_workflow_files(workflow_id)
+    files = api.list_workflow_files(workflow_id, depth=depth)
     if files is None:
         abort(404)
-    return jsonify(files)
+    return json_response(files)
 
 
 @engine_app.route('/workflows/<string:workflow_id>/submit', methods=['POST'])
@@ -276,21 +344,22 @@ def submit_tasks(workflow_id):
     """
     # Abort with BAD REQUEST if the request body is not in Json format or
     # does not contain a reference to a list of runnable nodes
-    if not request.json:
+    json_obj = request.get_json(silent=True, cache=False)
+    if not json_obj or not isinstance(json_obj, dict):
         abort(400)
-    json_obj = request.json
-    if not 'nodes' in json_obj:
+    nodes = json_obj.get('nodes')
+    if nodes is None:
         abort(400)
     # Submit nodes for execution. The result is None if the workflow does
     # not exist. Raises ValueError if any of the given nodes is not submittable.
     try:
-        workflow = api.submit_nodes(workflow_id, json_obj['nodes'])
+        workflow = api.submit_nodes(workflow_id, nodes)
         if workflow is None:
             abort(404)
     except ValueError as ex:
         abort(400)
     # Return the descriptor of the modified workflow.
-    return jsonify(workflow)
+    return json_response(workflow)
 
 
 # ------------------------------------------------------------------------------
@@ -299,6 +368,12 @@ def submit_tasks(workflow_id):
 #
 # ------------------------------------------------------------------------------
 
+def json_response(obj, status=200):
+    """Json response for a serialized API resource. Bypasses jsonify to use
+    the faster encoder (if available)."""
+    return Response(json_dumps(obj), status=status, mimetype='application/json')
+
+
 @engine_app.errorhandler(404)
 def not_found(error):
     """404 JSON response generator."""
@@ -10,13 +10,25 @@ The workflow repository manages and persists information about running and
 completed workflow instances. The default repository implementation uses
 MongoDB as the storage backend.
 """
+from collections import OrderedDict
+import atexit
 import datetime
 import functools
+import logging
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from operator import itemgetter
 import os
+import threading
 import uuid
+import zlib
 
+from bson import BSON
+from bson.binary import Binary
 from bson.objectid import ObjectId
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import ConnectionFailure, PyMongoError
+from pymongo.write_concern import WriteConcern
 
 from adage.nodestate import DEFINED, RUNNING, FAILED, SUCCESS
 from packtivity.asyncbackends import CeleryBackend
@@ -45,16 +57,118 @@ WORKFLOW_SUCCESS = 'SUCCESS'
 
 WORKFLOW_STATES = [WORKFLOW_RUNNING, WORKFLOW_IDLE, WORKFLOW_ERROR, WORKFLOW_SUCCESS]
 
+# Default maximum number of deserialized workflow objects that are kept in
+# memory by the workflow repository.
+DEFAULT_CACHE_SIZE = 128
+
+# Default number of threads that are used to load workflow instances in
+# parallel when listing workflows.
+DEFAULT_POOL_SIZE = min(32, 4 * cpu_count())
+
+# Workflow states can be stored compressed (optional parameter db.compress).
+# The compressed BSON encoding of the state is kept in the given field of the
+# state document. Use a fast compression level since states are written on
+# every commit.
+COMPRESSED_STATE = 'compressedState'
+COMPRESSION_LEVEL = 1
+
+# Fields of metadata objects that are read when loading or listing workflows.
+# Documents are fetched from the server in batches of the given size.
+METADATA_FIELDS = ['_id', 'name', 'status', 'createdAt', 'workflow']
+LIST_BATCH_SIZE = 1000
+
+# Extract identifier, name, status, and creation timestamp from a metadata
+# object.
+DESCRIPTOR_FIELDS = itemgetter('_id', 'name', 'status', 'createdAt')
+
+# Options for MongoDB clients. Clients are shared by all repositories in the
+# process (keyed by connection Uri). The pool keeps a minimum number of open
+# connections so that bursts of requests do not have to connect first.
+# Operations fail instead of blocking a request thread indefinitely if no
+# connection becomes available or the server does not respond.
+CLIENT_OPTIONS = {
+    'appname' : 'yadage-engine',
+    'maxPoolSize' : 50,
+    'minPoolSize' : 5,
+    'waitQueueTimeoutMS' : 2000,
+    'serverSelectionTimeoutMS' : 3000,
+    'socketTimeoutMS' : 30000
+}
+CLIENTS = {}
+# Identifier of the process that created the clients. A forked child process
+# must not use the connection pools of its parent.
+CLIENTS_PID = None
+
+# Write concern for workflow status updates in the metadata collection. These
+# writes are not acknowledged.
+STATUS_WRITE_CONCERN = WriteConcern(w=0)
+CLIENTS_LOCK = threading.Lock()
+
+# Final workflow states. The status of a workflow does not change once it is
+# in one of these states. ERROR is not final since it is also the status of
+# workflows whose state failed to validate. These workflows are evaluated
+# again when they are loaded.
+WORKFLOW_TERMINAL_STATES = frozenset([WORKFLOW_SUCCESS])
+
+# Workflows in one of these states may change their status without user
+# interaction.
+WORKFLOW_ACTIVE_STATES = [WORKFLOW_RUNNING, WORKFLOW_IDLE, WORKFLOW_ERROR]
+
+# Yadage backend that submits workflow steps to Celery. The backend is shared
+# by all repositories in the process and created on first use.
+BACKEND = None
+BACKEND_LOCK = threading.Lock()
+
 # ------------------------------------------------------------------------------
 #
 # Workflow Instances
 #
 # ------------------------------------------------------------------------------
 
-class WorkflowInstance(object):
+class WorkflowDescriptor(object):
+    """Workflow descriptor containing the basic information about a workflow
+    instance as stored in the metadata collection of the repository.
+
+    Attributes
+    ----------
+    identifier : string
+        Unique workflow identifier
+    name : string
+        User-defined workflow name
+    status : string
+        Workflow state object
+    createdAt : string
+        Timestamp of creation (UTC)
+    """
+    __slots__ = ('identifier', 'name', 'status', 'createdAt')
+
+    def __init__(self, identifier, name, status, createdAt):
+        """Initialize the descriptor properties.
+
+        Parameters
+        ----------
+        identifier : string
+            Unique workflow identifier
+        name : string
+            User-defined workflow name
+        status : string
+            Workflow state object
+        createdAt : string
+            Timestamp of creation (UTC)
+        """
+        self.identifier = identifier
+        self.name = name
+        self.status = status
+        self.createdAt = createdAt
+
+
+class WorkflowInstance(WorkflowDescriptor):
     """Full workflow instance object. Extends the workflow descriptor with the
     internal state of workflow execution.
 
+    An instance is expected to be used by a single thread while holding the
+    lock for the workflow. The state is only read from the repository once.
+
     Attributes
     ----------
     identifier : string
@@ -71,8 +185,19 @@ class WorkflowInstance(object):
         List of applicable rules
     submittable_nodes : list(adage.AdageNode)
         List of submittable nodes
+    controller : yadage.controllers.PersistentController
+        Controller for the workflow (None for workflows in a terminal state)
+    committed_state : dict
+        Workflow state that was last loaded from or committed to the
+        repository. The state is normalized (see normalize_state) and never
+        modified.
+    loaded_state : dict
+        State document that is used for the initial load (or None)
+    state_is_current : bool
+        Flag indicating whether the committed state was read from or written
+        to the repository by this instance. Subsequent loads reuse it.
     """
-    def __init__(self, metadata, db, backend):
+    def __init__(self, metadata, db, backend, state=None):
         """Initialize the identfifier, name, state, dag, rules, applied rules
         and applicable rule identifier. At this stage all ADAGE objects are
         simply Json objects.
@@ -87,36 +212,37 @@ class WorkflowInstance(object):
             Workflow repository to get and update workflow state
         backend : packtivity.PythonCallableAsyncBackend
             Default Yadage backend
+        state : dict, optional
+            Workflow state document that was read from the repository already.
+            Used for the initial load instead of reading the state again. The
+            state has to be current, i.e., it must not be read before the
+            workflow lock was acquired.
         """
-        self.identifier = str(metadata['_id'])
-        self.name = metadata['name']
-        self.createdAt = metadata['createdAt']
+        super(WorkflowInstance, self).__init__(
+            str(metadata['_id']),
+            metadata['name'],
+            metadata['status'],
+            metadata['createdAt']
+        )
         self.db = db
         self.wflowid = metadata['workflow']
-        self.deserializer = functools.partial(
-            load_state_custom_deserializer,
-            backend=backend
-        )
+        self.committed_state = None
+        self.loaded_state = state
+        self.state_is_current = False
+        self.deserializer = db.deserializer
+        # Workflows in a terminal state have no applicable rules or
+        # submittable nodes and their state does not change. Avoid
+        # deserializing the workflow graph for them. The state is read when it
+        # is first accessed.
+        if self.status in WORKFLOW_TERMINAL_STATES:
+            self.controller = None
+            self.applicable_rules = []
+            self.submittable_nodes = []
+            return
         #try:
         self.controller = PersistentController(self)
         self.controller.backend = backend
-        # Get the list of identifier for rules that are applicable.
-        self.applicable_rules = self.controller.applicable_rules()
-        # Get list of identifier for submittable nodes
-        self.submittable_nodes = self.controller.submittable_nodes()
-        if self.controller.validate():
-            if self.controller.finished():
-                if self.controller.successful():
-                    self.status = WORKFLOW_SUCCESS
-                else:
-                    self.status = WORKFLOW_ERROR
-            else:
-                if len(self.applicable_rules) > 0 or len(self.submittable_nodes) > 0:
-                    self.status = WORKFLOW_IDLE
-                else:
-                    self.status = WORKFLOW_RUNNING
-        else:
-            self.status = WORKFLOW_ERROR
+        self.update_status()
         #except AttributeError as ex:
             #print ex
             # Set status to error if the workflow cannot be initialized
@@ -144,7 +270,8 @@ class WorkflowInstance(object):
     def apply_rules(self, rule_instances):
         """Apply a given set of rule instances.
 
-        Raises ValueError if any of the selected rules is not applicable.
+        Raises ValueError if any of the selected rules is not applicable or if
+        the list contains duplicates. The error lists all offending rules.
 
         Parameters
         ----------
@@ -153,15 +280,18 @@ class WorkflowInstance(object):
         """
         # Ensure that all selected rules are applicable and that there are
         # no duplicates in the list
-        rules = set()
-        for rule_id in rule_instances:
-            if not rule_id in self.applicable_rules:
-                raise ValueError('not applicable: ' + rule_id)
-            elif rule_id in rules:
-                raise ValueError('duplicate rule: ' + rule_id)
-            rules.add(rule_id)
-        # Apply the list of rules
-        self.controller.apply_rules(rule_instances)
+        rules = validate_selection(
+            rule_instances,
+            self.applicable_rules,
+            'not applicable',
+            'duplicate rules'
+        )
+        if len(rules) == 0:
+            return
+        # Apply the list of rules. The controller selects the rules by testing
+        # each workflow rule for membership in the given collection, i.e., pass
+        # the set instead of the list.
+        self.controller.apply_rules(rules)
 
     def commit(self, data):
         """Update workflow state. Implements method from
@@ -172,9 +302,18 @@ class WorkflowInstance(object):
         data : yadage.YadageWorkflow
             Yadage workflow object
         """
-        print 'COMMIT ' + str(self.wflowid)
-        #print data.json()
-        self.db.update_Workflow(self.wflowid, data.json())
+        # The controller commits at the end of every transaction, including
+        # backend synchronizations that did not change the workflow state. Only
+        # write the state if it differs from the last loaded/committed state.
+        # The states are compared as documents since the key order of the
+        # serialized workflow differs from the order of a decoded state.
+        state = normalize_state(data.json())
+        if state != self.committed_state:
+            self.db.update_Workflow(self.wflowid, state)
+        self.committed_state = state
+        self.state_is_current = True
+        # Return the workflow object to the cache for subsequent loads
+        self.db.cache.put(self.wflowid, state, data)
 
     def json(self):
         """Retrieve workflow state. Implements method from
@@ -186,12 +325,57 @@ class WorkflowInstance(object):
         """Retrieve workflow state. Implements method from
         yadage.controllers.MongoBackedModel.
         """
-        return self.deserializer(self.json())
+        # Use a state document that was passed to the constructor only once.
+        # Subsequent loads read the state that was committed since.
+        if not self.loaded_state is None:
+            state = self.loaded_state
+            self.loaded_state = None
+        elif self.state_is_current:
+            # The state was read or written by this instance. Nobody else
+            # modifies the workflow while the lock is held.
+            adageobj = self.db.cache.pop(self.wflowid, self.committed_state)
+            if adageobj is None:
+                adageobj = self.deserializer(
+                    normalize_state(self.committed_state)
+                )
+            return adageobj
+        else:
+            state = self.json()
+            self.state_is_current = True
+        # Keep the loaded state unmodified. The deserialized workflow references
+        # (and modifies) parts of the state object it was created from, i.e.,
+        # deserialize a copy.
+        del state['_id']
+        self.committed_state = state
+        # Deserializing the workflow graph is expensive. Use the cached object
+        # if it was committed with the same state.
+        adageobj = self.db.cache.pop(self.wflowid, state)
+        if adageobj is None:
+            adageobj = self.deserializer(normalize_state(state))
+        return adageobj
+
+    def state(self):
+        """Get the workflow state as of the last load or commit instead of
+        reading it from the repository again. The returned state must not be
+        modified.
+
+        Returns
+        -------
+        dict
+        """
+        # The state of workflows in a terminal state is not loaded on
+        # initialization
+        if self.committed_state is None:
+            state = self.json()
+            del state['_id']
+            self.committed_state = state
+        return self.committed_state
 
     def submit_nodes(self, node_instances):
         """Submit a given set of node instances.
 
-        Raises ValueError if any of the selected nodes is not submittable.
+        Raises ValueError if any of the selected nodes is not submittable or if
+        the list contains duplicates. The error lists all offending nodes.
 
         Parameters
         ----------
@@ -200,16 +384,62 @@ class WorkflowInstance(object):
         """
         # Ensure that all selected nodes are submitttable and that there are
         # no duplicates in the list
-        nodes = set()
-        for node_id in node_instances:
-            if not node_id in self.submittable_nodes:
-                raise ValueError('not submittable: ' + node_id)
-            elif node_id in nodes:
-                raise ValueError('duplicate node: ' + node_id)
-            nodes.add(node_id)
+        nodes = validate_selection(
+            node_instances,
+            self.submittable_nodes,
+            'not submittable',
+            'duplicate nodes'
+        )
+        if len(nodes) == 0:
+            return
         # Submit the list of nodes
         self.controller.submit_nodes(node_instances)
 
+    def update_status(self):
+        """Compute the applicable rules, submittable nodes, and the status of
+        the workflow from the current workflow object of the controller. The
+        workflow state is synchronized with the backend.
+
+        Called when the instance is initialized and after rules were applied
+        or nodes were submitted. Updates the status in the metadata collection
+        of the repository if it changed.
+        """
+        # The status of workflows in a terminal state does not change
+        if self.controller is None:
+            return
+        previous_status = self.status
+        # Get the list of identifier for rules that are applicable.
+        self.applicable_rules = self.controller.applicable_rules()
+        # Get list of identifier for submittable nodes
+        self.submittable_nodes = self.controller.submittable_nodes()
+        if self.controller.validate():
+            # The workflow object has only been read so far. Return it to the
+            # cache so that the synchronization in finished() can reuse it.
+            self.db.cache.put(
+                self.wflowid,
+                self.committed_state,
+                self.controller.adageobj
+            )
+            if self.controller.finished():
+                # The call to finished() synchronized the workflow state with
+                # the backend. Check for failed nodes directly instead of
+                # calling successful() which would synchronize again.
+                if has_failed_nodes(self.controller.adageobj.dag):
+                    self.status = WORKFLOW_ERROR
+                else:
+                    self.status = WORKFLOW_SUCCESS
+            else:
+                if len(self.applicable_rules) > 0 or len(self.submittable_nodes) > 0:
+                    self.status = WORKFLOW_IDLE
+                else:
+                    self.status = WORKFLOW_RUNNING
+        else:
+            self.status = WORKFLOW_ERROR
+        # Keep the status in the metadata collection current. Listing relies on
+        # it to avoid loading the state of workflows that have finished.
+        if self.status != previous_status:
+            self.db.update_workflow_status(self.identifier, self.status)
+
 
 # ------------------------------------------------------------------------------
 #
@@ -224,11 +454,38 @@ class WorkflowRepository(object):
     ----------
     connector : MongoDBFactory
         Connector for MongoDB database
+    backend : yadage.backends.packtivitybackend.PacktivityBackend
+        Shared Yadage backend for workflow step execution
+    collections : tuple
+        Process identifier and the collection handles (metadata, workflows,
+        metadata_status) of the process (or None)
+    metadata : pymongo.collection.Collection
+        Collection of workflow metadata objects
+    workflows : pymongo.collection.Collection
+        Collection of workflow states
+    metadata_status : pymongo.collection.Collection
+        Metadata collection with unacknowledged writes for status updates
     workflow_dir : string
         Base directory for all workflow files
+    compress_states : bool
+        Flag indicating whether workflow states are stored compressed
+    deserializer : func
+        Function that deserializes a workflow state
+    cache : WorkflowObjectCache
+        Cache for deserialized workflow objects
+    pool_size : int
+        Number of threads used to load workflow instances when listing
+    indexes_pending : bool
+        Flag indicating whether the indexes for the metadata collection still
+        have to be created
     """
     def __init__(self, config):
-        """Initialize the database connector and workflow directory.
+        """Initialize the database connector, workflow directory, and the
+        workflow object cache. The indexes for the metadata collection are
+        created on first use unless parameter mongo.indexes is false. The
+        maximum cache size is taken from parameter db.cachesize (optional).
+        The number of threads that load workflow instances in parallel is
+        taken from parameter db.poolsize (optional).
 
         Parameters
         ----------
@@ -237,17 +494,128 @@ class WorkflowRepository(object):
         """
         # Initialize the MongoDB connector
         self.store = MongoDBConnector(config)
-        # Directory for workflow files
+        # Backend for workflow step execution
+        self.backend = get_backend()
+        # Collection handles are created on first use in each process (see
+        # get_collections).
+        self.collections = None
+        # Directory for workflow files. Create the directory if it does not
+        # exist.
         self.workflow_dir = os.path.abspath(config['db.workdir'])
+        if not os.access(self.workflow_dir, os.F_OK):
+            os.makedirs(self.workflow_dir)
+        # Store workflow states compressed. States are always decompressed on
+        # read, i.e., the parameter can be changed for an existing database.
+        if 'db.compress' in config:
+            self.compress_states = config['db.compress']
+        else:
+            self.compress_states = False
+        # Deserializer for workflow states. Shared by all workflow instances.
+        self.deserializer = functools.partial(
+            load_state_custom_deserializer,
+            backend=self.backend
+        )
+        # Cache for deserialized workflow objects
+        if 'db.cachesize' in config:
+            self.cache = WorkflowObjectCache(config['db.cachesize'])
+        else:
+            self.cache = WorkflowObjectCache(DEFAULT_CACHE_SIZE)
+        # Indexes are created on first use (see create_indexes) so that the
+        # engine starts while the database is unreachable. Index creation can
+        # be disabled for users without the privilege to create indexes
+        # (optional parameter mongo.indexes).
+        if 'mongo.indexes' in config:
+            self.indexes_pending = bool(config['mongo.indexes'])
+        else:
+            self.indexes_pending = True
+        self.index_lock = threading.Lock()
+        # Thread pool for loading workflow instances. The pool is created on
+        # first use.
+        if 'db.poolsize' in config:
+            self.pool_size = config['db.poolsize']
+        else:
+            self.pool_size = DEFAULT_POOL_SIZE
+        self.pool = None
+        self.pool_lock = threading.Lock()
+
+    @property
+    def metadata(self):
+        """Collection of workflow metadata objects."""
+        return self.get_collections()[1]
 
     @property
-    def backend(self):
-        return pb.PacktivityBackend(packtivity_backend=CeleryBackend())
+    def metadata_status(self):
+        """Metadata collection with unacknowledged writes for status
+        updates."""
+        return self.get_collections()[3]
 
-    def create_workflow(self, workflow_template, name, init_data):
+    @property
+    def workflows(self):
+        """Collection of workflow states."""
+        return self.get_collections()[2]
+
+    def get_collections(self):
+        """Get the collection handles for the current process. The repository
+        may be created before the process is forked (e.g., by a server that
+        preloads the application). Handles that were inherited from the parent
+        process use the parent's client. They are replaced by handles for the
+        client of the current process (see get_client).
+
+        Returns
+        -------
+        (int, pymongo.collection.Collection, pymongo.collection.Collection,
+        pymongo.collection.Collection)
+        """
+        collections = self.collections
+        if collections is None or collections[0] != os.getpid():
+            db = self.store.get_database()
+            metadata = db.metadata
+            collections = (
+                os.getpid(),
+                metadata,
+                db.workflows,
+                metadata.with_options(write_concern=STATUS_WRITE_CONCERN)
+            )
+            self.collections = collections
+        return collections
+
+    def create_indexes(self):
+        """Create the indexes for the metadata collection if they have not
+        been created yet. Listings filter metadata objects by workflow status.
+        The compound index also serves queries on status that order by
+        creation time.
+
+        Errors are logged and do not prevent the calling query. Index
+        creation is attempted again on next use if the database was not
+        reachable.
+        """
+        if not self.indexes_pending:
+            return
+        with self.index_lock:
+            if not self.indexes_pending:
+                return
+            try:
+                self.metadata.create_index(
+                    [('status', ASCENDING), ('createdAt', DESCENDING)],
+                    background=True
+                )
+                self.indexes_pending = False
+            except ConnectionFailure as ex:
+                logging.exception(ex)
+            except PyMongoError as ex:
+                # E.g., missing privileges. Do not try again.
+                logging.exception(ex)
+                self.indexes_pending = False
+
+    def create_workflow(self, workflow_template, name, init_data, lock=None):
         """Create a new workflow instance in the repository. Assigns the given
         identifier and name to the new workflow instance.
 
+        If a lock function is given, the workflow is stored and the instance
+        is initialized while holding the lock that is returned for the new
+        workflow identifier. The workflow becomes visible to listings as soon
+        as it is stored.
+
         Parameters
         ----------
         workflow_template : dict
@@ -256,6 +624,8 @@ class WorkflowRepository(object):
             User-defined workflow name
         init_data : dict
             Dictionary of user-provided workflow arguments
+        lock : func, optional
+            Function that returns the lock for a given workflow identifier
 
         Returns
         -------
@@ -265,9 +635,10 @@ class WorkflowRepository(object):
         # Generate a unique identifier for the new workflow instance
         identifier = str(uuid.uuid4())
         # Create a new directory in the workflow base directory with the
-        # workflow identifier as the directory name.
+        # workflow identifier as the directory name. The base directory is
+        # created on initialization.
         workdir = os.path.join(self.workflow_dir, identifier)
-        os.makedirs(workdir)
+        os.mkdir(workdir)
         rootcontext = statecontext.merge_contexts(
             {},
             statecontext.make_new_context(workdir)
@@ -281,20 +652,27 @@ class WorkflowRepository(object):
         workflowobj.view().init(init_data)
         # Timestamp of object creation
         timestamp = datetime.datetime.utcnow().isoformat()
-        # Connect to MongoDB. Insert workflow state inti collection workflows
-        # and metadata inti collection metadata
-        db = self.store.get_database()
-        metadata = {
-            '_id' : identifier,
-            'name' : name,
-            'status' : WORKFLOW_IDLE,
-            'createdAt' : timestamp,
-            'workflow' : str(
-                db.workflows.insert_one(workflowobj.json()).inserted_id
-            )
-        }
-        db.metadata.insert_one(metadata)
-        return WorkflowInstance(metadata, self, self.backend)
+        # Insert workflow state inti collection workflows and metadata inti
+        # collection metadata
+        state = workflowobj.json()
+        if self.compress_states:
+            state = compress_state(state)
+        def store_instance():
+            metadata = {
+                '_id' : identifier,
+                'name' : name,
+                'status' : WORKFLOW_IDLE,
+                'createdAt' : timestamp,
+                'workflow' : str(
+                    self.workflows.insert_one(state).inserted_id
+                )
+            }
+            self.metadata.insert_one(metadata)
+            return WorkflowInstance(metadata, self, self.backend)
+        if lock is None:
+            return store_instance()
+        with lock(identifier):
+            return store_instance()
 
     def delete_workflow(self, workflow_id):
         """Delete workflow instance with the given identifier. The result
@@ -311,17 +689,17 @@ class WorkflowRepository(object):
         Boolean
             True, if worlflow deleted, False if not found
         """
-        # Connect to database
-        db = self.store.get_database()
-        # Retrieve metadata information for given workflow. Return False if it
+        # Delete the metadata information for given workflow. Return False if it
         # does not exist
-        cursor = db.metadata.find({'_id': workflow_id})
-        if cursor.count() == 0:
+        md = self.metadata.find_one_and_delete(
+            {'_id': workflow_id},
+            projection=['workflow']
+        )
+        if md is None:
             return False
-        md = cursor.next()
-        # Delete workflow and metadata
-        db.workflows.delete_one({'_id': md['workflow']})
-        db.metadata.delete_one({'_id': workflow_id})
+        # Delete the workflow state
+        self.cache.remove(md['workflow'])
+        self.workflows.delete_one({'_id': ObjectId(md['workflow'])})
         return True
 
     def get_workflow(self, workflow_id):
@@ -337,10 +715,11 @@ class WorkflowRepository(object):
         workflow.WorkflowInstance
             Workflow instance or None
         """
-        db = self.store.get_database()
-        cursor = db.metadata.find({'_id': workflow_id})
-        if cursor.count() > 0:
-            obj = cursor.next()
+        obj = self.metadata.find_one(
+            {'_id': workflow_id},
+            projection=METADATA_FIELDS
+        )
+        if not obj is None:
             return WorkflowInstance(obj, self, self.backend)
         else:
             return None
@@ -359,51 +738,218 @@ class WorkflowRepository(object):
         -------
         Json document
         """
-        # Connect to database
-        db = self.store.get_database()
-        return db.workflows.find_one({'_id' : ObjectId(workflow_id)})
+        return decompress_state(
+            self.workflows.find_one({'_id' : ObjectId(workflow_id)})
+        )
+
+    def get_workflow_states(self, workflow_ids):
+        """Get the states for a list of workflows in a single query.
+
+        Parameters
+        ----------
+        workflow_ids : list(string)
+            List of unique workflow state identifier
 
-    def get_workflow_stats(self):
+        Returns
+        -------
+        dict
+            Dictionary of Json documents keyed by workflow state identifier
+        """
+        cursor = self.workflows.find(
+            {'_id' : {'$in' : [ObjectId(wf_id) for wf_id in workflow_ids]}}
+        )
+        return {
+            str(doc['_id']) : decompress_state(doc)
+                for doc in cursor.batch_size(LIST_BATCH_SIZE)
+        }
+
+    def get_workflow_stats(self, lock=None):
         """Get a count of workflows in the database by workflow status.
 
+        Workflows in a terminal state are counted by the database. Only
+        workflows that are not in a terminal state are loaded to get their
+        current status.
+
+        Parameters
+        ----------
+        lock : func, optional
+            Function that returns the lock for a given workflow identifier
+
         Returns
         -------
         dict
             Dictionary containing dictionary of workflow status counts
         """
+        self.create_indexes()
         statistics = {status : 0 for status in WORKFLOW_STATES}
-        for workflow in self.list_workflows():
+        cursor = self.metadata.aggregate([
+            {'$match' : {'status' : {'$in' : list(WORKFLOW_TERMINAL_STATES)}}},
+            {'$group' : {'_id' : '$status', 'count' : {'$sum' : 1}}}
+        ])
+        for group in cursor:
+            statistics[group['_id']] += group['count']
+        documents = list(
+            self.metadata.find(
+                {'status' : {'$in' : WORKFLOW_ACTIVE_STATES}},
+                projection=METADATA_FIELDS
+            ).batch_size(LIST_BATCH_SIZE)
+        )
+        for workflow in self.load_workflows(documents, lock=lock):
             statistics[workflow.status] += 1
-            self.stats = statistics
         return statistics
 
-    def list_workflows(self, status=None):
+    def get_pool(self):
+        """Get the thread pool that is used to load workflow instances. Creates
+        the pool on first call.
+
+        Returns
+        -------
+        multiprocessing.pool.ThreadPool
+        """
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = ThreadPool(self.pool_size)
+            return self.pool
+
+    def list_workflows(self, status=None, lock=None):
         """List all workflow instances in the repository. Allows to filter the
         result by workflow status.
 
+        Workflows that are not in a terminal state are loaded and synchronized
+        with the backend in parallel. If a lock function is given, each of
+        these workflows is loaded (including its state) while holding the lock
+        that is returned for the workflow identifier. Otherwise, their states
+        are read in a single query up front.
+
         Parameters
         ----------
         status : string, optional
             Workflow status to filter by
+        lock : func, optional
+            Function that returns the lock for a given workflow identifier
 
         Returns
         -------
-        list(WorkflowInstance)
+        list(WorkflowDescriptor)
             Descriptors for workflow instances in the repository
         """
+        # Iterate over all metadata objects. The status of workflows that are in
+        # a terminal state does not change and is taken from the metadata
+        # object. All other workflows have to be loaded and synchronized with
+        # the backend. The status filter is applied after that
+        self.create_indexes()
         result = []
-        # Iterate over all metadata objects and generate the workflow instances.
-        # The status filter can only be applied after that
-        db = self.store.get_database()
-        cursor = db.metadata.find()
-        for document in cursor:
-            wf = WorkflowInstance(document, self, self.backend)
-            if not status is None:
-                if status != wf.status:
-                    continue
-            result.append(wf)
+        pending = []
+        # The status that is stored with the metadata of workflows in a
+        # terminal state is final. Workflows in any other state may since have
+        # reached the requested state.
+        if status is None:
+            query = {}
+        elif status in WORKFLOW_TERMINAL_STATES:
+            query = {'status' : {'$in' : [status] + WORKFLOW_ACTIVE_STATES}}
+        else:
+            query = {'status' : {'$in' : WORKFLOW_ACTIVE_STATES}}
+        cursor = self.metadata.find(query, projection=METADATA_FIELDS)
+        for document in cursor.batch_size(LIST_BATCH_SIZE):
+            if document['status'] in WORKFLOW_TERMINAL_STATES:
+                identifier, name, wf_status, created_at = DESCRIPTOR_FIELDS(
+                    document
+                )
+                result.append(
+                    WorkflowDescriptor(
+                        str(identifier),
+                        name,
+                        wf_status,
+                        created_at
+                    )
+                )
+            else:
+                result.append(None)
+                pending.append((len(result) - 1, document))
+        instances = self.load_workflows(
+            [document for _, document in pending],
+            lock=lock
+        )
+        for (index, _), wf in zip(pending, instances):
+            result[index] = wf
+        if not status is None:
+            result = [wf for wf in result if wf.status == status]
         return result
 
+    def load_workflows(self, documents, lock=None):
+        """Load the workflow instances for a list of metadata objects. The
+        instances are synchronized with the backend in parallel. Only their
+        descriptors are kept, i.e., at most one workflow graph per thread is
+        held in memory at a time.
+
+        If a lock function is given, each workflow is loaded while holding its
+        lock and the workflow state is read after the lock was acquired. A
+        state that was read before may be outdated by a concurrent operation
+        on the workflow. Without a lock, the states of all workflows are read
+        in a single query.
+
+        Parameters
+        ----------
+        documents : list(dict)
+            List of workflow metadata objects
+        lock : func, optional
+            Function that returns the lock for a given workflow identifier
+
+        Returns
+        -------
+        list(WorkflowDescriptor)
+            Workflow descriptors in the same order as the metadata objects
+        """
+        # Read the states of all workflows at once if the workflows are not
+        # locked. The controller evaluates rules, nodes, and the workflow
+        # status on the initial state, i.e., with a lock the state has to be
+        # read while the lock is held. Deserialization is still avoided for
+        # workflows whose cached object matches the current state.
+        states = {}
+        if lock is None and len(documents) > 0:
+            states = self.get_workflow_states(
+                [document['workflow'] for document in documents]
+            )
+        def load_instance(document):
+            # Release the state document once it is used
+            state = states.pop(document['workflow'], None)
+            if lock is None:
+                wf = WorkflowInstance(document, self, self.backend, state)
+            else:
+                with lock(str(document['_id'])):
+                    wf = WorkflowInstance(document, self, self.backend, state)
+            return WorkflowDescriptor(
+                wf.identifier,
+                wf.name,
+                wf.status,
+                wf.createdAt
+            )
+        if len(documents) > 1:
+            return self.get_pool().map(load_instance, documents)
+        else:
+            return [load_instance(document) for document in documents]
+
+    def update_workflow_status(self, identifier, status):
+        """Update the status of the workflow with the given identifier in the
+        metadata collection.
+
+        The stored status is bookkeeping for listings. It is recomputed
+        whenever a workflow that is not in a terminal state is loaded. Updates
+        are therefore not acknowledged. If an update is lost the workflow is
+        loaded again by the next listing, which repeats the update.
+
+        Parameters
+        ----------
+        identifier : string
+            Unique workflow identifier
+        status : string
+            New workflow status
+        """
+        self.metadata_status.update_one(
+            {'_id' : identifier},
+            {'$set': {'status' : status}}
+        )
+
     def update_Workflow(self, workflow_id, data):
         """Update the state of the workflow with the given identifier.
 
@@ -415,10 +961,10 @@ class WorkflowRepository(object):
         data : JSON
             JSON representation of the workflow state
         """
-        # Connect to database
-        db = self.store.get_database()
         # Update workflow state in workflow collection
-        db.workflows.replace_one({'_id' : ObjectId(workflow_id)}, data)
+        if self.compress_states:
+            data = compress_state(data)
+        self.workflows.replace_one({'_id' : ObjectId(workflow_id)}, data)
         # Update the last modified date in the metadata
         #timestamp = datetime.datetime.utcnow().isoformat()
         #db.metadata.update_one(
@@ -427,6 +973,90 @@ class WorkflowRepository(object):
         #)
 
 
+# ------------------------------------------------------------------------------
+# Workflow Object Cache
+# ------------------------------------------------------------------------------
+
+class WorkflowObjectCache(object):
+    """Size-bounded cache of deserialized workflow objects. Each object is
+    stored together with the (normalized) workflow state it was committed
+    with. An object is only returned if that state equals the current state in
+    the repository. States are compared as documents, i.e., independently of
+    the order of keys.
+
+    Workflow objects are modified by the controller. An object is therefore
+    removed from the cache when it is loaded and only put back when it is
+    committed. Objects of failed operations never return to the cache.
+    """
+    def __init__(self, size):
+        """Initialize the maximum cache size.
+
+        Parameters
+        ----------
+        size : int
+            Maximum number of cached workflow objects
+        """
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def pop(self, workflow_id, state):
+        """Remove the cached object for the given workflow. Returns None if
+        there is no object or if it was committed with a different state.
+
+        Parameters
+        ----------
+        workflow_id : string
+            Unique workflow state identifier
+        state : dict
+            Current workflow state
+
+        Returns
+        -------
+        yadage.YadageWorkflow
+        """
+        with self.lock:
+            entry = self.entries.pop(workflow_id, None)
+        if entry is None:
+            return None
+        # Within a single workflow instance the committed state object is
+        # passed back. Avoid comparing the full documents in this case.
+        if entry[0] is state or entry[0] == state:
+            return entry[1]
+        return None
+
+    def put(self, workflow_id, state, adageobj):
+        """Add workflow object to the cache. Evicts the least recently added
+        object if the cache is full.
+
+        Parameters
+        ----------
+        workflow_id : string
+            Unique workflow state identifier
+        state : dict
+            Normalized workflow state the object was committed with. The state
+            must not be modified.
+        adageobj : yadage.YadageWorkflow
+            Yadage workflow object
+        """
+        with self.lock:
+            self.entries.pop(workflow_id, None)
+            self.entries[workflow_id] = (state, adageobj)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def remove(self, workflow_id):
+        """Remove the cached object for the given workflow (if any).
+
+        Parameters
+        ----------
+        workflow_id : string
+            Unique workflow state identifier
+        """
+        with self.lock:
+            self.entries.pop(workflow_id, None)
+
+
 # ------------------------------------------------------------------------------
 # MongoDB Connector
 # ------------------------------------------------------------------------------
@@ -453,26 +1083,220 @@ class MongoDBConnector(object):
         self.db_name = config['mongo.db'] if 'mongo.db' in config else 'yadage'
 
     def get_database(self):
-        """Connect to MongoDB and return database object.
+        """Get the database object. Uses the shared client for the connection
+        Uri.
 
         Returns
         -------
         MongoDb.database
             MongoDB database object
         """
-        if not self.db_uri is None:
-            return MongoClient(self.db_uri)[self.db_name]
-        else:
-            return MongoClient()[self.db_name]
+        return get_client(self.db_uri)[self.db_name]
 
 
 # ------------------------------------------------------------------------------
 # Helper Methods
 # ------------------------------------------------------------------------------
 
+def close_clients():
+    """Close all MongoDB clients that were created by this process. Registered
+    to run when the interpreter exits.
+    """
+    with CLIENTS_LOCK:
+        if CLIENTS_PID == os.getpid():
+            for client in CLIENTS.values():
+                client.close()
+        CLIENTS.clear()
+
+
+atexit.register(close_clients)
+
+
+def compress_state(state):
+    """Get the document that stores the given workflow state compressed.
+
+    Parameters
+    ----------
+    state : dict
+        Workflow state
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        COMPRESSED_STATE : Binary(
+            zlib.compress(BSON.encode(state), COMPRESSION_LEVEL)
+        )
+    }
+
+
+def decompress_state(document):
+    """Get the workflow state from a document in the workflows collection.
+    Returns the document as it is if the state is not compressed.
+
+    Parameters
+    ----------
+    document : dict
+        Document from the workflows collection (or None)
+
+    Returns
+    -------
+    dict
+    """
+    if document is None or not COMPRESSED_STATE in document:
+        return document
+    state = BSON(zlib.decompress(document[COMPRESSED_STATE])).decode()
+    state['_id'] = document['_id']
+    return state
+
+
+def get_backend():
+    """Get the Yadage backend that submits workflow steps to Celery. There is
+    one backend per process that is created on first use. The backend holds
+    no per-workflow state. Tasks are sent through the Celery app, which
+    maintains its own producer and connection pools.
+
+    Returns
+    -------
+    yadage.backends.packtivitybackend.PacktivityBackend
+    """
+    global BACKEND
+    with BACKEND_LOCK:
+        if BACKEND is None:
+            BACKEND = pb.PacktivityBackend(packtivity_backend=CeleryBackend())
+        return BACKEND
+
+
+def get_client(db_uri):
+    """Get the MongoDB client for the given connection Uri. MongoClient is
+    thread-safe and maintains its own connection pool. There is one client per
+    Uri and process that is created on first use. Clients are created anew in
+    a forked child process.
+
+    Parameters
+    ----------
+    db_uri : string
+        Connection string. Connects to the local instance on default port if
+        None.
+
+    Returns
+    -------
+    pymongo.MongoClient
+    """
+    global CLIENTS_PID
+    with CLIENTS_LOCK:
+        # Discard clients that were inherited from the parent process. Do not
+        # close them since their sockets are shared with the parent.
+        if CLIENTS_PID != os.getpid():
+            CLIENTS.clear()
+            CLIENTS_PID = os.getpid()
+        client = CLIENTS.get(db_uri)
+        if client is None:
+            client = MongoClient(db_uri, connect=False, **CLIENT_OPTIONS)
+            CLIENTS[db_uri] = client
+        return client
+
+
+def has_failed_nodes(dag):
+    """Test if any of the nodes in the given workflow graph has failed. Stops
+    at the first failed node.
+
+    Parameters
+    ----------
+    dag : adage.graph.AdageDAG
+        Workflow graph
+
+    Returns
+    -------
+    Boolean
+    """
+    get_node = dag.getNode
+    for node_id in dag.nodes():
+        if get_node(node_id).state == FAILED:
+            return True
+    return False
+
+
 def load_state_custom_deserializer(jsondata, backend=None):
     return YadageWorkflow.fromJSON(
         jsondata,
         VariableProxy,
         backend
     )
+
+
+def normalize_state(state):
+    """Get a copy of the given workflow state as it is returned when reading
+    the state from the repository, i.e., after a BSON encoding round trip.
+    States that are normalized can be compared for equality independently of
+    how they were created.
+
+    Parameters
+    ----------
+    state : dict
+        Workflow state
+
+    Returns
+    -------
+    dict
+    """
+    return BSON(BSON.encode(state)).decode()
+
+
+def validate_selection(selection, candidates, invalid_msg, duplicate_msg):
+    """Ensure that all identifier in a user selection are contained in the
+    list of candidates and that the selection does not contain duplicates.
+    Raises ValueError listing all invalid (or duplicate) identifier.
+
+    Parameters
+    ----------
+    selection : list(string)
+        List of selected identifier
+    candidates : list(string)
+        List of identifier that can be selected
+    invalid_msg : string
+        Prefix for the error message if identifier are not candidates
+    duplicate_msg : string
+        Prefix for the error message if identifier occur more than once
+
+    Returns
+    -------
+    set(string)
+        Set of selected identifier
+    """
+    selected = set(selection)
+    invalid = selected.difference(candidates)
+    if len(invalid) > 0:
+        raise ValueError(selection_error(invalid_msg, invalid))
+    if len(selected) != len(selection):
+        seen = set()
+        duplicates = set()
+        for identifier in selection:
+            if identifier in seen:
+                duplicates.add(identifier)
+            seen.add(identifier)
+        raise ValueError(selection_error(duplicate_msg, duplicates))
+    return selected
+
+
+def selection_error(message, identifiers):
+    """Error message listing the given identifier. Identifier in user
+    selections are unicode strings that may contain non-ASCII characters. The
+    message is UTF-8 encoded so that str() of the raised exception does not
+    fail.
+
+    Parameters
+    ----------
+    message : string
+        Prefix for the error message
+    identifiers : set(string)
+        Set of identifier that are listed in the message
+
+    Returns
+    -------
+    string
+    """
+    return (
+        unicode(message) + u': ' + u', '.join(sorted(unicode(i) for i in identifiers))
+    ).encode('utf-8')
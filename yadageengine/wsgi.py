@@ -0,0 +1,22 @@
+"""Yadage Workflow Engine - WSGI Application
+
+Exposes the Web API as a WSGI application for production servers, e.g.:
+
+    gunicorn -w 1 --threads 8 -b 0.0.0.0:25011 yadageengine.wsgi:application
+
+The engine serializes operations on a workflow using locks that are local to
+the server process. Use a single worker process with multiple threads to
+handle requests concurrently.
+"""
+
+from flask import Flask
+from werkzeug.wsgi import DispatcherMiddleware
+
+from yadageengine.server import engine_app
+
+
+# Load a dummy app at the root URL to give 404 errors. Serve app at
+# APPLICATION_ROOT.
+application = DispatcherMiddleware(Flask('dummy_app'), {
+    engine_app.config['APPLICATION_ROOT']: engine_app,
+})